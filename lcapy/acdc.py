@@ -1,6 +1,8 @@
 from .sym import sympify1
 import sympy as sym
 from sympy import cos, pi, sin, atan2, sqrt
+from sympy.functions.elementary.trigonometric import TrigonometricFunction
+from sympy.functions.elementary.hyperbolic import HyperbolicFunction
 
 class CausalChecker(object):
 
@@ -104,6 +106,12 @@ class ACChecker(object):
 
     def _is_ac(self, expr):
 
+        # An AC expression needs a sinusoid, or something that
+        # rewrites as one.  Checking for these first avoids the costly
+        # rewrite for expressions such as steps and impulses.
+        if not expr.has(sym.exp, TrigonometricFunction, HyperbolicFunction):
+            return False
+
         # Convert sum of exps into sin/cos
         expr = expr.rewrite(cos).combsimp().expand()
         
@@ -5,7 +5,7 @@ Copyright 2019 Michael Hayes, UCECE
 
 """
 
-from .symbols import s
+from .sym import ssym
 from .immitance import Immitance
 
 class Admittance(Immitance):    
@@ -45,14 +45,15 @@ class Admittance(Immitance):
         if self.is_number or self.is_dc:
             return G(self.expr)
 
-        y = self * s
+        # Scale by s at the SymPy level to avoid creating Expr objects.
+        y = self.expr * ssym
 
         if y.is_number:
-            return L((1 / y).expr)
+            return L(1 / y)
 
-        y = self / s
+        y = self.expr / ssym
 
         if y.is_number:
-            return C(y.expr)
+            return C(y)
 
         return Y(self)    
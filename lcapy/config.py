@@ -12,6 +12,10 @@ excludes = ['I', 'C', 'O', 'S', 'N', 'E', 'E1', 'Q', 'beta', 'gamma', 'zeta',
 aliases = {'delta': 'DiracDelta', 'step': 'Heaviside', 'u': 'Heaviside',
            'j': 'I'}
 
+# Simplify the result of Laplace transforms.  This can be more
+# expensive than the transform itself so it is off by default.
+laplace_simplify = False
+
 import sympy as sym
 str_expr_map = {sym.I: 'j'}
 
@@ -22,6 +22,9 @@ import sympy as sym
 from sympy.utilities.lambdify import lambdify
 from .sym import simplify
 from collections import OrderedDict
+from functools import lru_cache, cached_property
+from types import MethodType
+from inspect import signature
 
 class ExprPrint(object):
 
@@ -89,14 +92,31 @@ class ExprContainer(object):
         
         return self.__class__([simplify(v) for v in self])
 
+    def to_numpy(self):
+        """Convert numerical elements to a NumPy array.  The array is
+        real if all the elements are real, otherwise it is complex."""
+
+        return _to_numpy(self, len(self))
+
+    _symbols_cache = None
+
     @property    
     def symbols(self):
         """Return dictionary of symbols in the expression keyed by name."""
+
+        # The merged dictionary is cached and reused while the
+        # container holds the same elements.
+        elements = tuple(self)
+        cache = self._symbols_cache
+        if (cache is not None and len(cache[0]) == len(elements) and
+            all(e1 is e2 for e1, e2 in zip(cache[0], elements))):
+            return cache[1].copy()
         
         symbols = {}
-        for expr in list(self):
+        for expr in elements:
             symbols.update(expr.symbols)
-        return symbols
+        self._symbols_cache = elements, symbols
+        return symbols.copy()
 
     
 class ExprMisc(object):
@@ -138,6 +158,11 @@ class ExprDict(ExprPrint, ExprContainer, ExprMisc, OrderedDict):
             new[k] = v
         return new
 
+    def to_numpy(self):
+        """Convert numerical values (not the keys) to a NumPy array."""
+
+        return _to_numpy(self.values(), len(self))
+
     def simplify(self):
         """Simplify each element but not the keys."""
 
@@ -155,26 +180,29 @@ class ExprList(ExprPrint, list, ExprContainer, ExprMisc):
     # _repr_pretty_ method here.
     
     def __init__(self, arglist):
-        eargs = [expr(e) for e in arglist]
+        # Only use the expr factory for elements that are not Expr.
+        eargs = [e if isinstance(e, Expr) else expr(e) for e in arglist]
         super (ExprList, self).__init__(eargs)
 
     def subs(self, *args, **kwargs):
         """Substitute variables in expression, see sympy.subs for usage."""
         
-        return expr([e.subs(*args, **kwargs) for e in self])
+        return ExprList([e.subs(*args, **kwargs) for e in self])
         
     
 class ExprTuple(ExprPrint, tuple, ExprContainer, ExprMisc):
     """Decorator class for tuple created by sympy."""
 
-    def __init__(self, arglist):
-        eargs = [expr(e) for e in arglist]
-        super (ExprTuple, self).__init__(tuple(eargs))
+    def __new__(cls, arglist):
+        # The elements of a tuple have to be set by __new__.
+        # Only use the expr factory for elements that are not Expr.
+        eargs = [e if isinstance(e, Expr) else expr(e) for e in arglist]
+        return super (ExprTuple, cls).__new__(cls, eargs)
 
     def subs(self, *args, **kwargs):
         """Substitute variables in expression, see sympy.subs for usage."""
         
-        return expr((e.subs(*args, **kwargs) for e in self))
+        return ExprTuple([e.subs(*args, **kwargs) for e in self])
 
     
 class Expr(ExprPrint, ExprMisc):
@@ -182,6 +210,15 @@ class Expr(ExprPrint, ExprMisc):
 
     one_sided = False
     var = None
+    _hash = None
+    _rationalized = None
+    _ratfun_cache = None
+    _symbols_cache = None
+    _poly_cache = None
+    # Mapping of the class of a substituted expression to the class
+    # of the result, see _subs1.  This is populated at the end of
+    # this module for the domain classes.
+    _promote = {}
 
     # Perhaps have lookup table for operands to determine
     # the resultant type?  For example, Vs / Vs -> Hs
@@ -204,18 +241,31 @@ class Expr(ExprPrint, ExprMisc):
               classes.  The omega assumption is required for Phasors."""
 
         if isinstance(arg, Expr):
-            if assumptions == {}:
+            # The assumptions are copied rather than shared since
+            # they can be modified in place, say by infer_assumptions.
+            if not assumptions:
                 assumptions = arg.assumptions.copy()
-            self.assumptions = assumptions.copy()
+            self.assumptions = assumptions
             self.expr = arg.expr
+            self._hash = arg._hash
             return
             
         # Perhaps could set dc?
         if arg == 0:
             assumptions['causal'] = True
 
-        self.assumptions = assumptions.copy()
+        # The keyword arguments dict is new for each call so it
+        # can be used without copying.
+        self.assumptions = assumptions
+
+        if isinstance(arg, sym.Expr):
+            # SymPy expressions are used as is so there is no need
+            # to filter the assumptions.
+            self.expr = arg
+            return
+
         # Remove Lcapy assumptions from SymPy expr.
+        assumptions = assumptions.copy()
         assumptions.pop('nid', None)
         assumptions.pop('ac', None)
         assumptions.pop('dc', None)
@@ -290,27 +340,31 @@ class Expr(ExprPrint, ExprMisc):
 
     @property
     def is_dc(self):
-        if 'dc' not in self.assumptions:
+        value = self.assumptions.get('dc', _missing)
+        if value is _missing:
             self.infer_assumptions()
-        return self.assumptions['dc'] == True
+            value = self.assumptions['dc']
+        return value is True
 
     @property
     def is_ac(self):
-        if 'ac' not in self.assumptions:
+        value = self.assumptions.get('ac', _missing)
+        if value is _missing:
             self.infer_assumptions()
-        return self.assumptions['ac'] == True
+            value = self.assumptions['ac']
+        return value is True
 
     @property
     def is_causal(self):
-        if 'causal' not in self.assumptions:
+        value = self.assumptions.get('causal', _missing)
+        if value is _missing:
             self.infer_assumptions()
-        return self.assumptions['causal'] == True
+            value = self.assumptions['causal']
+        return value is True
 
     @property
     def is_complex(self):
-        if 'complex' not in self.assumptions:
-            return False
-        return self.assumptions['complex'] == True
+        return self.assumptions.get('complex') is True
 
     @property
     def val(self):
@@ -319,12 +373,12 @@ class Expr(ExprPrint, ExprMisc):
 
         return self.evalf()
 
-    @property
-    def evalf(self):
+    def evalf(self, *args, **kwargs):
         """Return floating point value of expression if it can be evaluated,
         otherwise the expression."""
 
-        return self.expr.evalf()    
+        return self.__class__(self.expr.evalf(*args, **kwargs),
+                              **self.assumptions)
 
     @property
     def omega(self):
@@ -336,8 +390,11 @@ class Expr(ExprPrint, ExprMisc):
 
     def __hash__(self):
         # This is needed for Python3 so can create a dict key,
-        # say for subs.
-        return hash(self.expr)
+        # say for subs.  The expression is not modified after
+        # construction so the hash is cached.
+        if self._hash is None:
+            self._hash = hash(self.expr)
+        return self._hash
 
 # This will allow sym.sympify to magically extract the sympy expression
 # but it will also bypass our __rmul__, __radd__, etc. methods that get called
@@ -360,8 +417,8 @@ class Expr(ExprPrint, ExprMisc):
         # FIXME.  This propagates the assumptions.  There is a
         # possibility that the operation may violate them.
         expr = self.expr
-        if hasattr(expr, attr):
-            a = getattr(expr, attr)
+        a = getattr(expr, attr, _missing)
+        if a is not _missing:
 
             # If it is not callable, directly wrap it.
             if not hasattr(a, '__call__'):
@@ -372,24 +429,9 @@ class Expr(ExprPrint, ExprMisc):
                     return self.__class__(ret, **self.assumptions)
                 return self.__class__(ret)
 
-            # If it is callable, create a function to pass arguments
+            # If it is callable, bind a function to pass arguments
             # through and wrap its return value.
-            def wrap(*args):
-                """This is wrapper for a SymPy function.
-                For help, see the SymPy documentation."""
-
-                ret = a(*args)
-
-                if not isinstance(ret, sym.Expr):
-                    return ret
-
-                # Wrap the return value
-                cls = self.__class__
-                if hasattr(self, 'assumptions'):
-                    return cls(ret, **self.assumptions)
-                return cls(ret)
-
-            return wrap
+            return MethodType(_sympy_method_wrapper(attr), self)
 
         # Try looking for a sympy function with the same name,
         # such as sqrt, log, etc.
@@ -447,38 +489,15 @@ class Expr(ExprPrint, ExprMisc):
             elif self.is_dc and x.is_ac:
                 assumptions = {'ac' : True}                
 
-        if cls == xcls:
-            return cls, self, cls(x), assumptions
-
-        # Allow omega * t but treat as t expression.
-        if isinstance(self, omegaExpr) and isinstance(x, tExpr):
-            return xcls, self, x, assumptions
-        if isinstance(self, tExpr) and isinstance(x, omegaExpr):
-            return cls, self, x, assumptions                    
-        
-        if xcls in (Expr, cExpr):
-            return cls, self, cls(x), assumptions
-
-        if cls in (Expr, cExpr):
-            return xcls, self, x, assumptions
-
-        if isinstance(x, cls):
-            return xcls, self, cls(x), assumptions
+        result = _compat_dispatch(cls, xcls, 'mul')
+        if result is None:
+            raise ValueError('Cannot combine %s(%s) with %s(%s) for %s' %
+                             (cls.__name__, self, xcls.__name__, x, op))
 
-        if isinstance(self, xcls):
-            return cls, self, cls(x), assumptions
-
-        if isinstance(self, tExpr) and isinstance(x, tExpr):
-            return cls, self, cls(x), assumptions
-
-        if isinstance(self, sExpr) and isinstance(x, sExpr):
-            return cls, self, cls(x), assumptions
-
-        if isinstance(self, omegaExpr) and isinstance(x, omegaExpr):
-            return cls, self, cls(x), assumptions
-
-        raise ValueError('Cannot combine %s(%s) with %s(%s) for %s' %
-                         (cls.__name__, self, xcls.__name__, x, op))
+        rcls, wrap_self, wrap_x = result
+        if wrap_x:
+            x = cls(x)
+        return rcls, self, x, assumptions
 
     def __compat_add__(self, x, op):
 
@@ -496,28 +515,17 @@ class Expr(ExprPrint, ExprMisc):
             if self.assumptions == x.assumptions:
                 assumptions = self.assumptions
         
-        if cls == xcls:
-            return cls, self, x, assumptions
-
-        # Handle Vs + sExpr etc.
-        if isinstance(self, xcls):
-            return cls, self, x, assumptions
-
-        # Handle sExpr + Vs etc.
-        if isinstance(x, cls):
-            return xcls, self, cls(x), assumptions
-
-        if xcls in (Expr, cExpr):
-            return cls, self, x, assumptions
-
-        if cls in (Expr, cExpr):
-            return xcls, cls(self), x, assumptions
-
-        if cls in (Impedance, Admittance) and isinstance(x, omegaExpr):
-            return cls, self, cls(x), assumptions        
-
-        raise ValueError('Cannot combine %s(%s) with %s(%s) for %s' %
-                         (cls.__name__, self, xcls.__name__, x, op))
+        result = _compat_dispatch(cls, xcls, 'add')
+        if result is None:
+            raise ValueError('Cannot combine %s(%s) with %s(%s) for %s' %
+                             (cls.__name__, self, xcls.__name__, x, op))
+
+        rcls, wrap_self, wrap_x = result
+        if wrap_self:
+            self = cls(self)
+        if wrap_x:
+            x = cls(x)
+        return rcls, self, x, assumptions
 
     def __rdiv__(self, x):
         """Reverse divide"""
@@ -586,6 +594,16 @@ class Expr(ExprPrint, ExprMisc):
     def __pow__(self, x):
         """Pow"""
 
+        # Fast path for integer exponents; this avoids converting
+        # the exponent to an Expr.
+        if isinstance(x, int) and not isinstance(x, bool):
+            if x == 1:
+                # Copy since the result may be modified.
+                return self.__class__(self)
+            if x == 0:
+                return self.__class__(1)
+            return self.__class__(self.expr ** x)
+
         # TODO: FIXME
         cls, self, x, assumptions = self.__compat_mul__(x, '**')
         return cls(self.expr ** x.expr, **assumptions)
@@ -608,6 +626,9 @@ class Expr(ExprPrint, ExprMisc):
         if x is None:
             return False
 
+        if x is self:
+            return True
+
         try:
             cls, self, x, assumptions = self.__compat_add__(x, '==')
         except ValueError:
@@ -617,7 +638,7 @@ class Expr(ExprPrint, ExprMisc):
 
         # This fails if one of the operands has the is_real attribute
         # and the other doesn't...
-        return sym.simplify(self.expr - x.expr) == 0
+        return _is_zero(self.expr - x.expr)
 
     def __ne__(self, x):
         """Test for mathematical inequality as far as possible.
@@ -627,10 +648,13 @@ class Expr(ExprPrint, ExprMisc):
         if x is None:
             return True
 
+        if x is self:
+            return False
+
         cls, self, x, assumptions = self.__compat_add__(x, '!=')
         x = cls(x)
 
-        return sym.simplify(self.expr - x.expr) != 0        
+        return not _is_zero(self.expr - x.expr)
 
     def __gt__(self, x):
         """Greater than"""
@@ -690,25 +714,39 @@ class Expr(ExprPrint, ExprMisc):
 
         return self.__class__(sym.conjugate(self.expr), **self.assumptions)
 
+    @cached_property
+    def _real(self):
+        # The cached parts are never returned directly since Expr
+        # objects can be modified, say by setting part or units.
+        # The public properties return copies; the assumptions are
+        # passed to keep the nid of noise expressions.
+        assumptions = self.assumptions.copy()
+        assumptions['real'] = True        
+
+        return self.__class__(symsimplify(sym.re(self.expr)), **assumptions)
+
     @property
     def real(self):
         """Return real part."""
 
-        assumptions = self.assumptions.copy()
-        assumptions['real'] = True        
-
-        dst = self.__class__(symsimplify(sym.re(self.expr)), **assumptions)
+        dst = self._real
+        dst = dst.__class__(dst, **dst.assumptions)
         dst.part = 'real'
         return dst
 
+    @cached_property
+    def _imag(self):
+        assumptions = self.assumptions.copy()
+        assumptions['real'] = True
+        
+        return self.__class__(symsimplify(sym.im(self.expr)), **assumptions)
+
     @property
     def imag(self):
         """Return imaginary part."""
 
-        assumptions = self.assumptions.copy()
-        assumptions['real'] = True
-        
-        dst = self.__class__(symsimplify(sym.im(self.expr)), **assumptions)
+        dst = self._imag
+        dst = dst.__class__(dst, **dst.assumptions)
         dst.part = 'imaginary'
         return dst
 
@@ -720,7 +758,13 @@ class Expr(ExprPrint, ExprMisc):
 
     @property
     def _ratfun(self):
-        return Ratfun(self.expr, self.var)
+        # The expression and variable are fixed after construction
+        # so the Ratfun object is cached.  Ratfun objects are shared
+        # between expressions with the same SymPy expression so that
+        # their cached roots and poles can be reused.
+        if self._ratfun_cache is None:
+            self._ratfun_cache = _ratfun_for(self.expr, self.var)
+        return self._ratfun_cache
 
     @property
     def K(self):
@@ -758,20 +802,27 @@ class Expr(ExprPrint, ExprMisc):
 
         return self.__class__(self._ratfun.denominator)
 
+    def _rationalized_parts(self):
+        """Return tuple of real and imaginary parts of the numerator, and
+        the denominator, after multiplying numerator and denominator
+        by complex conjugate of denominator."""
+
+        # Expressions are immutable so the result is cached.
+        if self._rationalized is None:
+            N = self.N
+            D = self.D
+            Dconj = D.conjugate
+            Nnew = (N * Dconj).simplify()
+            Dnew = (D.real**2 + D.imag**2).simplify()
+            self._rationalized = Nnew.real, Nnew.imag, Dnew
+        return self._rationalized
+
     def rationalize_denominator(self):
         """Rationalize denominator by multiplying numerator and denominator by
         complex conjugate of denominator."""
 
-        N = self.N
-        D = self.D
-        Dconj = D.conjugate
-        Nnew = (N * Dconj).simplify()
-        #Dnew = (D * Dconj).simplify()
-        Dnew = (D.real**2 + D.imag**2).simplify()
-
-        Nnew = Nnew.real_imag
-
-        return Nnew / Dnew
+        Nr, Ni, Dnew = self._rationalized_parts()
+        return (Nr + j * Ni) / Dnew
 
     def divide_top_and_bottom(self, factor):
         """Divide numerator and denominator by common factor."""
@@ -781,19 +832,21 @@ class Expr(ExprPrint, ExprMisc):
 
         return N / D
     
+    @cached_property
+    def _magnitude(self):
+        if self.is_real:
+            return self
+
+        Nr, Ni, Dnew = self._rationalized_parts()
+        Nnew = sqrt((Nr**2 + Ni**2).simplify())
+        return Nnew / Dnew
+
     @property
     def magnitude(self):
         """Return magnitude"""
 
-        if self.is_real:
-            dst = self
-        else:
-            R = self.rationalize_denominator()
-            N = R.N
-            Dnew = R.D
-            Nnew = sqrt((N.real**2 + N.imag**2).simplify())
-            dst = Nnew / Dnew
-
+        dst = self._magnitude
+        dst = dst.__class__(dst, **dst.assumptions)
         dst.part = 'magnitude'
         return dst
 
@@ -820,21 +873,25 @@ class Expr(ExprPrint, ExprMisc):
         dst.units = 'dB'
         return dst
 
+    @cached_property
+    def _phase(self):
+        Nr, Ni, Dnew = self._rationalized_parts()
+
+        if Ni == 0:
+            return Ni
+
+        if Nr != 0:
+            G = gcd(Nr, Ni)
+            Nr = Nr / G
+            Ni = Ni / G
+        return atan2(Ni, Nr)
+
     @property
     def phase(self):
         """Return phase in radians."""
 
-        R = self.rationalize_denominator()
-        N = R.N
-
-        if N.imag == 0:
-            dst = N.imag
-        else:
-            if N.real != 0:
-                G = gcd(N.real, N.imag)
-                N = N / G
-            dst = atan2(N.imag, N.real)
-            
+        dst = self._phase
+        dst = dst.__class__(dst, **dst.assumptions)
         dst.part = 'phase'
         dst.units = 'rad'
         return dst
@@ -854,11 +911,16 @@ class Expr(ExprPrint, ExprMisc):
 
         return self.phase
 
+    @cached_property
+    def _polar(self):
+        return self.abs * exp(j * self.phase)
+
     @property
     def polar(self):
         """Return in polar format"""
 
-        return self.abs * exp(j * self.phase)
+        dst = self._polar
+        return dst.__class__(dst, **dst.assumptions)
 
     @property
     def cartesian(self):
@@ -885,92 +947,95 @@ class Expr(ExprPrint, ExprMisc):
         
         return expr.is_constant()
 
-    def evaluate(self, arg=None):
+    def evaluate(self, arg=None, backend=None):
         """Evaluate expression at arg.  arg may be a scalar, or a vector.
         The result is of type float or complex.
 
         There can be only one or fewer undefined variables in the expression.
         This is replaced by arg and then evaluated to obtain a result.
-        """
 
-        def evaluate_expr(expr, var, arg):
+        If backend is 'numba', vector arguments are evaluated using
+        a Numba compiled ufunc, if possible.  This is beneficial for
+        repeated evaluation with long vectors.  Similarly, if backend
+        is 'numexpr', vector arguments of expressions comprised of
+        elementary functions are evaluated using NumExpr.
+        """
 
-            # For some reason the new lambdify will convert a float
-            # argument to complex
-            
-            def exp(arg):
+        if backend not in (None, 'numba', 'numexpr'):
+            raise ValueError('Unknown backend %s' % backend)
 
-                # Hack to handle exp(-a * t) * Heaviside(t) for t < 0
-                # by trying to avoid inf when number overflows float.
+        def evaluate_expr(expr, var, arg):
 
-                if isinstance(arg, complex):
-                    if arg.real > 500:
-                        arg = 500 + 1j * arg.imag
-                elif arg > 500:
-                    arg = 500;                        
+            func, ufunc1 = _lambdify(expr, var)
 
-                return np.exp(arg)
+            def evaluate1(arg):
 
-            def dirac(arg):
-                return np.inf if arg == 0.0 else 0.0
+                try:
+                    return complex(func(arg))
+                except NameError as e:
+                    raise RuntimeError('Cannot evaluate expression %s: %s' % (self, e))
+                except AttributeError as e:
+                    if False and expr.is_Piecewise:
+                        raise RuntimeError(
+                            'Cannot evaluate expression %s,'
+                            ' due to undetermined conditional result' % self)
 
-            def heaviside(arg):
-                return 1.0 if arg >= 0.0 else 0.0
+                    raise RuntimeError(
+                        'Cannot evaluate expression %s,'
+                        ' probably have a mysterious function: %s' % (self, e))
 
-            def sqrt(arg):
-                # Large numbers get converted to ints and int has no sqrt
-                # attribute so convert to float.
-                if isinstance(arg, int):
-                    arg = float(arg)
-                if not isinstance(arg, complex) and arg < 0:
-                    arg = arg + 0j
-                return np.sqrt(arg)
+                except TypeError as e:
+                    raise RuntimeError('Cannot evaluate expression %s: %s' % (self, e))
 
             try:
-                arg0 = arg[0]
+                arg[0]
                 scalar = False
             except:
-                arg0 = arg
                 scalar = True
 
-            # For negative arguments, np.sqrt will return Nan.
-            # np.lib.scimath.sqrt converts to complex but cannot be used
-            # for lamdification!
-            func = lambdify(var, expr,
-                            ({'DiracDelta' : dirac,
-                              'Heaviside' : heaviside,
-                              'sqrt' : sqrt, 'exp' : exp},
-                             "scipy", "numpy", "math", "sympy"))
-
-            try:
-                result = func(arg0)
-                response = complex(result)
-            except NameError as e:
-                raise RuntimeError('Cannot evaluate expression %s: %s' % (self, e))
-            except AttributeError as e:
-                if False and expr.is_Piecewise:
-                    raise RuntimeError(
-                        'Cannot evaluate expression %s,'
-                        ' due to undetermined conditional result' % self)
-
-                raise RuntimeError(
-                    'Cannot evaluate expression %s,'
-                    ' probably have a mysterious function: %s' % (self, e))
-
-            except TypeError as e:
-                raise RuntimeError('Cannot evaluate expression %s: %s' % (self, e))
-            
             if scalar:
+                response = evaluate1(arg)
                 if np.allclose(response.imag, 0.0):
                     response = response.real
                 return response
 
+            arg = np.asarray(arg)
+            ufunc = None
+            if backend == 'numba':
+                dtype = np.complex128 if np.iscomplexobj(arg) else np.float64
+                ufunc = _numba_ufunc(expr, var, dtype)
+            elif backend == 'numexpr':
+                dtype = np.complex128 if np.iscomplexobj(arg) else np.float64
+                ufunc = _numexpr_func(expr, var, dtype)
+
+            response = None
             try:
-                response = np.array([complex(func(arg0)) for arg0 in arg])
-            except TypeError:
-                raise TypeError(
-                    'Cannot evaluate expression %s,'
-                    ' probably have undefined symbols' % self)
+                if ufunc is not None:
+                    response = ufunc(arg.astype(dtype)).astype(complex)
+                    # A ufunc compiled for real arguments gives nan
+                    # where the result is complex, say sqrt(-1), so
+                    # evaluate any non-finite elements without it.
+                    bad = ~np.isfinite(response)
+                    if dtype == np.float64 and bad.any():
+                        response[bad] = ufunc1(arg[bad]).astype(complex)
+                else:
+                    # Try evaluating the entire vector in one call;
+                    # this works unless one of the scalar helper
+                    # functions is used.
+                    result = np.asarray(func(arg))
+                    if result.dtype != object:
+                        response = np.array(np.broadcast_to(result, arg.shape),
+                                            dtype=complex)
+            except Exception:
+                pass
+
+            if response is None:
+                # Fall back to evaluating one element at a time.
+                try:
+                    response = ufunc1(arg).astype(complex)
+                except Exception:
+                    # Repeat to report the offending element.
+                    response = np.array([evaluate1(arg1) for arg1 in arg])
 
             if np.allclose(response.imag, 0.0):
                 response = response.real
@@ -1004,7 +1069,7 @@ class Expr(ExprPrint, ExprMisc):
                 raise ValueError('Undefined symbols %s in expression %s' % (tuple(free_symbols), self))
 
         if arg is None:
-            if expr.find(var) != set():
+            if expr.has(var):
                 raise ValueError('Need value to evaluate expression at')
             # The arg is irrelevant since the expression is a constant.
             arg = 0
@@ -1032,8 +1097,15 @@ class Expr(ExprPrint, ExprMisc):
         V.has_symbol('a')
         V.has_symbol(t)
         
-        """                        
-        return self.has(symbol(sym))
+        """
+
+        # Avoid creating an Expr wrapper; for a known name, symsymbol
+        # just looks up the symbol in the current context.
+        if isinstance(sym, str):
+            sym = symsymbol(sym)
+        elif isinstance(sym, Expr):
+            sym = sym.expr
+        return self.expr.has(sym)
     
     def _subs1(self, old, new, **kwargs):
 
@@ -1053,40 +1125,20 @@ class Expr(ExprPrint, ExprMisc):
             expr = new.expr
         else:
             cls = self.__class__
-            expr = sympify(expr)
-
-        class_map = {(Hs, omegaExpr) : Homega,
-                     (Is, omegaExpr) : Iomega,
-                     (Vs, omegaExpr) : Vomega,
-                     (Ys, omegaExpr) : Yomega,
-                     (Zs, omegaExpr) : Zomega,
-                     (Admittance, omegaExpr) : Yomega,
-                     (Impedance, omegaExpr) : Zomega,                     
-                     (Hs, fExpr) : Hf,
-                     (Is, fExpr) : If,
-                     (Vs, fExpr) : Vf,
-                     (Ys, fExpr) : Yf,
-                     (Zs, fExpr) : Zf,
-                     (Admittance, fExpr) : Yf,
-                     (Impedance, fExpr) : Zf,                     
-                     (Hf, omegaExpr) : Homega,
-                     (If, omegaExpr) : Iomega,
-                     (Vf, omegaExpr) : Vomega,
-                     (Yf, omegaExpr) : Yomega,
-                     (Zf, omegaExpr) : Zomega,
-                     (Homega, fExpr) : Hf,
-                     (Iomega, fExpr) : If,
-                     (Vomega, fExpr) : Vf,
-                     (Yomega, fExpr) : Yf,
-                     (Zomega, fExpr) : Zf,
-                     (Admittance, sExpr) : Ys,
-                     (Impedance, sExpr) : Zs}                     
-
-        if (self.__class__, new.__class__) in class_map:
-            cls = class_map[(self.__class__, new.__class__)]
-
-        old = symbol_map(old)
-        result = self.expr.subs(old, expr)
+            expr = _to_sym(expr)
+
+        # Promote the class when substituting a domain variable,
+        # for example, Hs(s) -> Homega(omega).
+        cls = self._promote.get(new.__class__, cls)
+
+        if (old is self.var and old is not None and expr.is_Number and
+            _can_xreplace(self.expr)):
+            # Substituting a number for the variable is common.  This
+            # can be done without the pattern matching of subs.
+            result = self.expr.xreplace({old: expr})
+        else:
+            old = symbol_map(old)
+            result = self.expr.subs(old, expr)
 
         # If get empty Piecewise, then result unknowable.  TODO: sympy
         # 1.2 requires Piecewise constructor to have at least one
@@ -1102,39 +1154,63 @@ class Expr(ExprPrint, ExprMisc):
         from .transform import transform
         return transform(self, arg, **assumptions)
 
-    def __call__(self, arg, **assumptions):
+    def __call__(self, arg, backend=None, **assumptions):
         """Substitute arg for variable.  If arg is an tuple or list
         return a list.  If arg is an numpy array, return
-        numpy array.
+        numpy array.  The substitution is exact; for example,
+        log(t) at t = -1 gives j * pi and Heaviside(t) at t = 0 is
+        left undefined.
+
+        If backend is 'numba' or 'numexpr', a numerical numpy array
+        is instead evaluated with evaluate using that backend,
+        returning a float or complex array.  This is much faster for
+        long arrays.
 
         See also evaluate.
         """
 
+        # A number cannot be a domain variable so substitute directly
+        # rather than dispatching through transform.call.
+        if isinstance(arg, (int, float, complex, np.number)):
+            return self._subs1(self.var, arg)
+
         if isinstance(arg, (tuple, list)):
             return [self._subs1(self.var, arg1) for arg1 in arg]
 
         if isinstance(arg, np.ndarray):
-            return np.array([self._subs1(self.var, arg1) for arg1 in arg])
+            if backend is not None and arg.dtype.kind in 'biufc':
+                return self.evaluate(arg, backend=backend)
+            # Substitute each element, filling the result array in
+            # place.
+            result = np.empty(arg.shape, dtype=object)
+            flat = result.reshape(-1)
+            for m, arg1 in enumerate(arg.flat):
+                flat[m] = self._subs1(self.var, arg1)
+            return result
 
         from .transform import call        
         return call(self, arg, **assumptions)
 
+    @cached_property
+    def _free_symbols_by_name(self):
+        """Dictionary of the free symbols keyed by name."""
+
+        return {str(symbol):symbol for symbol in self.expr.free_symbols}
+
     def limit(self, var, value, dir='+'):
         """Determine limit of expression(var) at var = value."""
 
         # Need to use lcapy sympify otherwise could use
         # getattr to call sym.limit.
 
-        var = sympify(var)
-        value = sympify(value)
+        var = _to_sym(var)
+        value = _to_sym(value)
 
         # Experimental.  Compare symbols by names.
-        symbols = list(self.expr.free_symbols)
-        symbolnames = [str(symbol) for symbol in symbols]
-        if str(var) not in symbolnames:
+        var = self._free_symbols_by_name.get(str(var))
+        if var is None:
             return self
-        var = symbols[symbolnames.index(str(var))]
-        
+
         ret = sym.limit(self.expr, var, value)
         if hasattr(self, 'assumptions'):
             return self.__class__(ret, **self.assumptions)
@@ -1158,6 +1234,21 @@ class Expr(ExprPrint, ExprMisc):
             return self._subs1(args[0], args[1])
 
         if  isinstance(args[0], dict):
+            # If none of the substitutions change the class of the
+            # result, perform them with a single SymPy subs call.  The
+            # pairs are substituted sequentially in the same order as
+            # for repeated calls of _subs1.
+            pairs = []
+            for key, val in args[0].items():
+                if (key == self.var or symbol_map(key) == self.var or
+                    val.__class__ in self._promote):
+                    pairs = None
+                    break
+                pairs.append((symbol_map(key), _to_sym(val)))
+
+            if pairs is not None:
+                return self.__class__(self.expr.subs(pairs), **self.assumptions)
+
             dst = self
             for key, val in args[0].items():
                 dst = dst._subs1(key, val, **kwargs)
@@ -1166,29 +1257,46 @@ class Expr(ExprPrint, ExprMisc):
 
         return self._subs1(self.var, args[0])
 
+    def _label_attr(self, attr):
+        """Return label attribute set for the instance or class, otherwise
+        None.  Unlike hasattr, this does not fall back to __getattr__,
+        which would search the SymPy expression."""
+
+        value = self.__dict__.get(attr, _missing)
+        if value is _missing:
+            value = getattr(self.__class__, attr, None)
+        return value
+
     @property
     def label(self):
 
+        quantity = self._label_attr('quantity')
+        part = self._label_attr('part')
+        units = self._label_attr('units')
+
         label = ''
-        if hasattr(self, 'quantity'):
-            label += self.quantity
-            if hasattr(self, 'part'):
-                label += ' ' + self.part
+        if quantity is not None:
+            label += quantity
+            if part is not None:
+                label += ' ' + part
         else:
-            if hasattr(self, 'part'):
-                label += capitalize_name(self.part)
-        if hasattr(self, 'units') and self.units != '':
-            label += ' (%s)' % self.units
+            if part is not None:
+                label += capitalize_name(part)
+        if units is not None and units != '':
+            label += ' (%s)' % units
         return label
 
     @property
     def domain_label(self):
 
+        domain_name = self._label_attr('domain_name')
+        domain_units = self._label_attr('domain_units')
+
         label = ''
-        if hasattr(self, 'domain_name'):
-            label += '%s' % self.domain_name
-        if hasattr(self, 'domain_units'):
-            label += ' (%s)' % self.domain_units
+        if domain_name is not None:
+            label += '%s' % domain_name
+        if domain_units is not None:
+            label += ' (%s)' % domain_units
         return label
 
     def differentiate(self, arg=None):
@@ -1208,11 +1316,16 @@ class Expr(ExprPrint, ExprMisc):
         if isinstance(arg, Expr):
             return arg.expr
 
+        # Most commonly a SymPy symbol so avoid the container checks.
+        if isinstance(arg, sym.Basic):
+            return arg
+
+        # Note, ExprTuple and ExprList are subclasses of tuple and list.
         if isinstance(arg, tuple):
-            return tuple([self._tweak_arg(arg1) for arg1 in arg])
+            return tuple(map(self._tweak_arg, arg))
 
         if isinstance(arg, list):
-            return [self._tweak_arg(arg1) for arg1 in arg]
+            return list(map(self._tweak_arg, arg))
 
         return arg
 
@@ -1232,13 +1345,20 @@ class Expr(ExprPrint, ExprMisc):
     @property
     def symbols(self):
         """Return dictionary of symbols in the expression keyed by name."""
+
+        # The dictionary is cached while the SymPy expression is unchanged.
+        cache = self._symbols_cache
+        if cache is not None and cache[0] is self.expr:
+            return cache[1].copy()
+
         symdict = {sym.name:sym for sym in self.free_symbols}
 
         # Look for V(s), etc.
         funcdict = {atom.func.__name__:atom for atom in self.atoms(sym.function.AppliedUndef)}        
 
         symdict.update(funcdict)
-        return symdict
+        self._symbols_cache = self.expr, symdict
+        return symdict.copy()
 
     def roots(self, aslist=False):
         """Return roots of expression as a dictionary
@@ -1268,15 +1388,12 @@ class Expr(ExprPrint, ExprMisc):
             polesdict = {}
             for pole in poles:
                 key = pole.expr
-                if key in polesdict:
-                    polesdict[pole.expr] += pole.n
-                else:
-                    polesdict[pole.expr] = pole.n
+                polesdict[key] = polesdict.get(key, 0) + pole.n
             return expr(polesdict)
             
         poleslist = []
         for pole in poles:
-            poleslist += [pole.expr] * pole.n
+            poleslist.extend([pole.expr] * pole.n)
         return expr(poleslist)
 
     def canonical(self, factor_const=False):
@@ -1390,13 +1507,21 @@ class Expr(ExprPrint, ExprMisc):
         
         If norm is True, normalise coefficients to highest power is 1."""
 
-        try:
-            z = sym.Poly(self.expr, self.var)
-        except:
-            raise ValueError('Use .N or .D attribute to specify numerator or denominator of rational function')
+        # The Poly object is cached since the expression is not modified.
+        z = self._poly_cache
+        if z is None:
+            try:
+                z = sym.Poly(self.expr, self.var)
+            except (sym.PolynomialError, sym.GeneratorsNeeded) as e:
+                raise ValueError('Use .N or .D attribute to specify numerator or denominator of rational function') from e
+            self._poly_cache = z
 
         c = z.all_coeffs()
         if norm:
+            # Simplification is only needed for a symbolic leading
+            # coefficient.
+            if c[0].is_Number:
+                return expr([c1 / c[0] for c1 in c])
             return expr([sym.simplify(c1 / c[0]) for c1 in c])
             
         return expr(c)
@@ -1454,21 +1579,339 @@ class Expr(ExprPrint, ExprMisc):
         """Prune higher order terms if expression is a polynomial
         so that resultant approximate expression has the desired degree."""
 
-        coeffs = self.coeffs
-        if len(coeffs) < degree:
+        coeffs = self.coeffs()
+        if len(coeffs) <= degree + 1:
             return self
 
         coeffs = coeffs[::-1]
 
-        expr = sym.S.Zero
+        # Build the terms and then sum them with a single Add to
+        # avoid repeatedly flattening the partial sum.
         var = self.var
+        varpow = sym.S.One
+        terms = []
         for m in range(degree + 1):
-            term = coeffs[m].expr * var ** m
-            expr += term
+            terms.append(coeffs[m].expr * varpow)
+            varpow *= var
 
-        return self.__class__(expr, **self.assumptions)            
+        return self.__class__(sym.Add(*terms), **self.assumptions)
     
     
+_missing = object()
+
+
+def _to_numpy(values, count):
+    """Convert count numerical values to a NumPy array.  The array is
+    real if all the values are real, otherwise it is complex."""
+
+    result = np.fromiter((complex(v.expr if isinstance(v, Expr) else v)
+                          for v in values), dtype=complex, count=count)
+    if not np.any(result.imag):
+        result = result.real.copy()
+    return result
+
+
+def _to_sym(arg):
+    """Convert arg to a SymPy object.  Lcapy sympify is only called
+    if arg is not already a SymPy object."""
+
+    if isinstance(arg, Expr):
+        return arg.expr
+    if isinstance(arg, sym.Basic):
+        return arg
+    return sympify(arg)
+
+
+@lru_cache(maxsize=4096)
+def _ratfun_for(expr, var):
+    """Return Ratfun object for expr with respect to var.  This is
+    memoized since Ratfun objects cache their roots and poles."""
+
+    return Ratfun(expr, var)
+
+
+def _is_zero(value):
+    """Return True if value is zero.  This may be a SymPy expression,
+    an Expr, or a superposition (a dict of Exprs).  A structural check
+    and SymPy's assumptions are tried before resorting to
+    simplification."""
+
+    if isinstance(value, dict):
+        return all(_is_zero(value1) for value1 in value.values())
+
+    expr = getattr(value, 'expr', value)
+    if expr == 0:
+        return True
+    is_zero = getattr(expr, 'is_zero', None)
+    if is_zero is not None:
+        return is_zero
+    return sym.simplify(expr) == 0
+
+
+@lru_cache(maxsize=1024)
+def _sympy_method_wrapper(attr):
+    """Create a function that calls the SymPy method attr of the wrapped
+    expression and wraps its return value.  The function is bound to
+    an Expr instance by Expr.__getattr__.  This only depends on attr
+    so it is memoized."""
+
+    def wrap(self, *args):
+        """This is wrapper for a SymPy function.
+        For help, see the SymPy documentation."""
+
+        ret = getattr(self.expr, attr)(*args)
+
+        if not isinstance(ret, sym.Expr):
+            return ret
+
+        # Wrap the return value
+        cls = self.__class__
+        if hasattr(self, 'assumptions'):
+            return cls(ret, **self.assumptions)
+        return cls(ret)
+
+    return wrap
+
+
+@lru_cache(maxsize=1024)
+def _compat_dispatch(cls, xcls, kind):
+    """Determine the result class for combining Expr classes cls and
+    xcls.  kind is 'mul' for multiplicative operations or 'add' for
+    additive operations.  This returns a tuple (rcls, wrap_self,
+    wrap_x) where wrap_self and wrap_x indicate whether the operands
+    need converting to cls, or None if the classes are incompatible.
+    This only depends on the classes so it is memoized."""
+
+    if kind == 'mul':
+        if cls == xcls:
+            return cls, False, True
+
+        # Allow omega * t but treat as t expression.
+        if issubclass(cls, omegaExpr) and issubclass(xcls, tExpr):
+            return xcls, False, False
+        if issubclass(cls, tExpr) and issubclass(xcls, omegaExpr):
+            return cls, False, False
+
+        if xcls in (Expr, cExpr):
+            return cls, False, True
+
+        if cls in (Expr, cExpr):
+            return xcls, False, False
+
+        if issubclass(xcls, cls):
+            return xcls, False, True
+
+        if issubclass(cls, xcls):
+            return cls, False, True
+
+        for base in (tExpr, sExpr, omegaExpr):
+            if issubclass(cls, base) and issubclass(xcls, base):
+                return cls, False, True
+        return None
+
+    if cls == xcls:
+        return cls, False, False
+
+    # Handle Vs + sExpr etc.
+    if issubclass(cls, xcls):
+        return cls, False, False
+
+    # Handle sExpr + Vs etc.
+    if issubclass(xcls, cls):
+        return xcls, False, True
+
+    if xcls in (Expr, cExpr):
+        return cls, False, False
+
+    if cls in (Expr, cExpr):
+        return xcls, True, False
+
+    if cls in (Impedance, Admittance) and issubclass(xcls, omegaExpr):
+        return cls, False, True
+    return None
+
+
+# The following functions are used by lambdify in place of the NumPy
+# functions.  They handle both scalar and array arguments.
+# For some reason the new lambdify will convert a float
+# argument to complex.
+
+def _exp(arg):
+
+    # Hack to handle exp(-a * t) * Heaviside(t) for t < 0
+    # by trying to avoid inf when number overflows float.
+
+    if isinstance(arg, np.ndarray):
+        if np.iscomplexobj(arg):
+            arg = np.minimum(arg.real, 500) + 1j * arg.imag
+        else:
+            arg = np.minimum(arg, 500)
+    elif isinstance(arg, complex):
+        if arg.real > 500:
+            arg = 500 + 1j * arg.imag
+    elif arg > 500:
+        arg = 500;                        
+
+    return np.exp(arg)
+
+
+def _dirac(arg):
+
+    if isinstance(arg, np.ndarray):
+        return np.where(arg == 0.0, np.inf, 0.0)
+    return np.inf if arg == 0.0 else 0.0
+
+
+def _heaviside(arg):
+
+    if isinstance(arg, np.ndarray):
+        return np.where(arg >= 0.0, 1.0, 0.0)
+    return 1.0 if arg >= 0.0 else 0.0
+
+
+def _sqrt(arg):
+
+    # For negative arguments, np.sqrt will return Nan.
+    # np.emath.sqrt converts to complex but cannot be used
+    # for lamdification!
+    if isinstance(arg, np.ndarray):
+        return np.emath.sqrt(arg)
+
+    # Large numbers get converted to ints and int has no sqrt
+    # attribute so convert to float.
+    if isinstance(arg, int):
+        arg = float(arg)
+    if not isinstance(arg, complex) and arg < 0:
+        arg = arg + 0j
+    return np.sqrt(arg)
+
+
+# Common subexpression elimination is supported by newer SymPy versions.
+_LAMBDIFY_CSE = 'cse' in signature(lambdify).parameters
+
+_EVALUATE_MODULES = ({'DiracDelta' : _dirac,
+                      'Heaviside' : _heaviside,
+                      'sqrt' : _sqrt, 'exp' : _exp},
+                     "scipy", "numpy", "math", "sympy")
+
+
+@lru_cache(maxsize=512)
+def _lambdify(expr, var):
+    """Create numerical function for evaluating expr with respect to var.
+    This returns a tuple of the function and a ufunc version for
+    evaluating arrays element by element.  This is memoized since
+    lambdify is expensive compared to the evaluation of the generated
+    function."""
+
+    # Evaluate exact constants, such as sin(1) * exp(2), once here
+    # rather than every time the generated function is called.
+    # Expressions with conditional functions are left alone.
+    if (expr.free_symbols <= set((var, )) and
+        not expr.has(sym.Piecewise, sym.DiracDelta, sym.Heaviside)):
+        expr = expr.evalf()
+
+    if _LAMBDIFY_CSE:
+        # Reuse common subexpressions in the generated code.
+        func = lambdify(var, expr, _EVALUATE_MODULES, cse=True)
+    else:
+        func = lambdify(var, expr, _EVALUATE_MODULES)
+    return func, np.frompyfunc(func, 1, 1)
+
+
+@lru_cache(maxsize=512)
+def _can_xreplace(expr):
+    """Return True if a number can be substituted for a symbol in expr
+    by a plain tree replacement (xreplace) rather than subs.  This
+    is not the case if expr has objects with bound variables."""
+
+    return not expr.has(sym.Integral, sym.Derivative, sym.Subs, sym.Sum,
+                        sym.Product, sym.Lambda, sym.Limit)
+
+
+def _numba_conditionals(expr):
+    """Rewrite Heaviside and DiracDelta in expr as Piecewise expressions
+    that give the same values as _heaviside and _dirac, and give
+    Piecewise expressions a default value of nan, as for evaluate,
+    so that expr can be compiled by Numba."""
+
+    def piecewise(*args):
+        if args[-1][1] != True:
+            args += ((sym.nan, True), )
+        return sym.Piecewise(*args)
+
+    expr = expr.replace(sym.Heaviside, lambda arg, *rest:
+                        sym.Piecewise((1, arg >= 0), (0, True)))
+    expr = expr.replace(lambda e: isinstance(e, sym.DiracDelta)
+                        and len(e.args) == 1, lambda e:
+                        sym.Piecewise((sym.oo, sym.Eq(e.args[0], 0)),
+                                      (0, True)))
+    return expr.replace(sym.Piecewise, piecewise)
+
+
+@lru_cache(maxsize=128)
+def _numba_ufunc(expr, var, dtype):
+    """Create Numba compiled ufunc for evaluating expr with respect to var
+    for arrays of dtype (np.float64 or np.complex128).  None is returned
+    if Numba is not available or if the expression cannot be compiled."""
+
+    try:
+        import numba
+        from numba.core.errors import NumbaError
+    except ImportError:
+        return None
+
+    modules = 'numpy'
+    if expr.has(sym.Piecewise, sym.DiracDelta, sym.Heaviside):
+        # The conditions cannot be evaluated for complex arguments.
+        if dtype == np.complex128:
+            return None
+        # NumPy's select, used by lambdify for Piecewise, is not
+        # supported by Numba but the conditional expressions generated
+        # for the math module are.
+        expr = _numba_conditionals(expr)
+        modules = 'math'
+
+    # Numba cannot handle large SymPy integers so convert to float.
+    expr = expr.evalf()
+
+    # Note, the generated functions are not cached on disk
+    # (cache=True) since lambdify creates them dynamically and Numba
+    # can only cache functions defined in a file.  fastmath is not
+    # used since it does not preserve inf and nan handling.
+    ntype = numba.complex128 if dtype == np.complex128 else numba.float64
+    try:
+        func = lambdify(var, expr, modules)
+        ufunc = numba.vectorize([ntype(ntype)], target='parallel')(func)
+        # Check that the compiled function can be called.
+        ufunc(np.zeros(2, dtype=dtype))
+    except (NumbaError, NameError, TypeError, ValueError,
+            NotImplementedError):
+        return None
+    return ufunc
+
+
+@lru_cache(maxsize=128)
+def _numexpr_func(expr, var, dtype):
+    """Create compiled NumExpr object for evaluating expr with respect to
+    var for arrays of dtype (np.float64 or np.complex128).  None is
+    returned if NumExpr is not available or if the expression has
+    functions that NumExpr does not support."""
+
+    try:
+        import numexpr
+        from sympy.printing.lambdarepr import NumExprPrinter
+    except ImportError:
+        return None
+
+    try:
+        # This raises TypeError for unsupported functions, such
+        # as Heaviside and DiracDelta.
+        string = NumExprPrinter()._print(expr.evalf())
+        return numexpr.NumExpr(string, signature=[(var.name, dtype)])
+    except Exception:
+        return None
+
+
 def expr(arg, **assumptions):
     """Create Lcapy expression from arg.
 
@@ -1482,8 +1925,6 @@ def expr(arg, **assumptions):
 
     """
 
-    from .sym import tsym, fsym, ssym, omegasym
-
     if isinstance(arg, (Expr, ExprList, ExprTuple, ExprDict)):
         return arg
     elif isinstance(arg, list):
@@ -1494,16 +1935,28 @@ def expr(arg, **assumptions):
         return ExprDict(arg)    
     
     expr = sympify(arg, **assumptions)
+    return _expr_class(expr)(expr, **assumptions)
+
+
+@lru_cache(maxsize=4096)
+def _expr_class(expr):
+    """Return the Lcapy class for the SymPy expression expr based on
+    the domain variable it contains.  This is memoized since the same
+    expressions are commonly created many times.  Note, new Expr
+    objects are always created since they can be modified."""
+
+    from .sym import tsym, fsym, ssym, omegasym
+
     if expr.has(tsym):
-        return tExpr(expr, **assumptions)
+        return tExpr
     elif expr.has(ssym):
-        return sExpr(expr, **assumptions)
+        return sExpr
     elif expr.has(fsym):
-        return fExpr(expr, **assumptions)
+        return fExpr
     elif expr.has(omegasym):
-        return omegaExpr(expr, **assumptions)
+        return omegaExpr
     else:
-        return cExpr(expr, **assumptions)
+        return cExpr
 
 
 def symbol(name, **assumptions):
@@ -1524,6 +1977,24 @@ from .impedance import Impedance
 from .admittance import Admittance
 from .omegaexpr import Homega, Iomega, Vomega, Yomega, Zomega, omegaExpr
 
+Hs._promote = {omegaExpr : Homega, fExpr : Hf}
+Is._promote = {omegaExpr : Iomega, fExpr : If}
+Vs._promote = {omegaExpr : Vomega, fExpr : Vf}
+Ys._promote = {omegaExpr : Yomega, fExpr : Yf}
+Zs._promote = {omegaExpr : Zomega, fExpr : Zf}
+Admittance._promote = {omegaExpr : Yomega, fExpr : Yf, sExpr : Ys}
+Impedance._promote = {omegaExpr : Zomega, fExpr : Zf, sExpr : Zs}
+Hf._promote = {omegaExpr : Homega}
+If._promote = {omegaExpr : Iomega}
+Vf._promote = {omegaExpr : Vomega}
+Yf._promote = {omegaExpr : Yomega}
+Zf._promote = {omegaExpr : Zomega}
+Homega._promote = {fExpr : Hf}
+Iomega._promote = {fExpr : If}
+Vomega._promote = {fExpr : Vf}
+Yomega._promote = {fExpr : Yf}
+Zomega._promote = {fExpr : Zf}
+
 # Horrible hack to work with IPython around Sympy's back for LaTeX
 # formatting.  The problem is that Sympy does not check for the
 # _repr_latex method and instead relies on a predefined list of known
@@ -1536,6 +2007,6 @@ try:
     
     for cls in (ExprList, ExprTuple, ExprDict):
         formatter.type_printers[cls] = Expr._repr_latex_
-except:
+except (ImportError, AttributeError, KeyError):
     pass
         
@@ -26,10 +26,10 @@ class fExpr(Expr):
         # Define when class defined.
         self._fourier_conjugate_class = tExpr
 
-        if self.expr.find(ssym) != set():
+        if self.expr.has(ssym):
             raise ValueError(
                 'f-domain expression %s cannot depend on s' % self.expr)
-        if self.expr.find(tsym) != set():
+        if self.expr.has(tsym):
             raise ValueError(
                 'f-domain expression %s cannot depend on t' % self.expr)
 
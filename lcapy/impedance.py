@@ -6,7 +6,7 @@ Copyright 2019 Michael Hayes, UCECE
 """
 
 
-from .symbols import s
+from .sym import ssym
 from .immitance import Immitance
 
 class Impedance(Immitance):
@@ -46,15 +46,16 @@ class Impedance(Immitance):
         if self.is_number or self.is_dc:
             return R(self.expr)
 
-        z = self * s
+        # Scale by s at the SymPy level to avoid creating Expr objects.
+        z = self.expr * ssym
 
         if z.is_number:
-            return C((1 / z).expr)
+            return C(1 / z)
 
-        z = self / s
+        z = self.expr / ssym
 
         if z.is_number:
-            return L(z.expr)
+            return L(z)
 
         return Z(self)
     
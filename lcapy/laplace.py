@@ -21,13 +21,29 @@ Copyright 2016--2019 Michael Hayes, UCECE
 
 """
 
+from . import config
 from .ratfun import Ratfun
-from .sym import sympify, simplify
+from .sym import sympify
 from .utils import factor_const, scale_shift
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 import sympy as sym
 
-laplace_cache = {}
-inverse_laplace_cache = {}
+# Number of processes used to transform the terms of an expression in
+# parallel.  This is only worthwhile for expressions with many terms
+# since starting the processes is expensive.  The default of 1 does
+# not use parallel processing.
+n_jobs = 1
+parallel_min_terms = 8
+
+# Maximum number of results cached for each transform.  The caches
+# are keyed by the SymPy expressions themselves.  SymPy stores the hash
+# of an expression when it is first computed and dictionary lookups
+# check identity before equality, so repeated transforms of the same
+# expression object do not walk the expression tree.  Note, SymPy
+# objects do not support weak references so they cannot be interned
+# with a WeakValueDictionary.
+cache_size = 4096
 
 
 def laplace_limits(expr, t, s, tmin, tmax):
@@ -60,6 +76,25 @@ def laplace_0(expr, t, s):
     return laplace_limits(expr, t, s, 0, sym.oo)
 
 
+@lru_cache(maxsize=1024)
+def undef_function(name):
+    """Return undefined function class for name."""
+
+    return sym.Function(name)
+
+
+def undef_image(name, arg, upper=True):
+    """Return the transform of the undefined function name evaluated
+    at arg.  For example, V(arg) for v if upper is True or v(arg) for
+    V if upper is False."""
+
+    if upper:
+        name = name[0].upper() + name[1:]
+    else:
+        name = name[0].lower() + name[1:]
+    return undef_function(name)(arg)
+
+
 def laplace_func(expr, t, s, inverse=False):
 
     if not isinstance(expr, sym.function.AppliedUndef):
@@ -67,16 +102,9 @@ def laplace_func(expr, t, s, inverse=False):
 
     scale, shift = scale_shift(expr.args[0], t)    
 
-    ssym = sympify(str(s))
-    
     # Convert v(t) to V(s), etc.
     name = expr.func.__name__
-    if inverse:
-        func = name[0].lower() + name[1:] + '(%s)' % s
-    else:
-        func = name[0].upper() + name[1:] + '(%s)' % s
-
-    result = sympify(func).subs(ssym, s / scale) / abs(scale)
+    result = undef_image(name, s / scale, not inverse) / abs(scale)
 
     if shift != 0:
         result = result * sym.exp(s * shift / scale)    
@@ -116,16 +144,8 @@ def laplace_integral(expr, t, s):
         and (f2.args[0] != var or f1.args[0] != t - var)):
         raise ValueError('Cannot recognise convolution: %s' % expr)
 
-    ssym = sympify(str(s))
-    
-    name = f1.func.__name__
-    func1 = name[0].upper() + name[1:] + '(%s)' % str(ssym)
-
-    name = f2.func.__name__
-    func2 = name[0].upper() + name[1:] + '(%s)' % str(ssym)    
-
-    F1 = sympify(func1).subs(ssym, s)
-    F2 = sympify(func2).subs(ssym, s)
+    F1 = undef_image(f1.func.__name__, s)
+    F2 = undef_image(f2.func.__name__, s)
     
     return F1 * F2
 
@@ -138,29 +158,73 @@ def laplace_derivative_undef(expr, t, s):
         expr.args[1][0] != t):
         raise ValueError('Cannot compute Laplace transform of %s' % expr)
 
-    ssym = sympify(str(s))    
     name = expr.args[0].func.__name__    
-    func1 = name[0].upper() + name[1:] + '(%s)' % str(ssym)    
-    return sympify(func1).subs(ssym, s) * s ** expr.args[1][1]
-
-def laplace_term(expr, t, s):
+    return undef_image(name, s) * s ** expr.args[1][1]
+
+# Flags for the classes of function found in an expression.
+INTEGRAL = 1
+UNDEF = 2
+DERIVATIVE = 4
+HEAVISIDE_T = 8
+DIRAC = 16
+HEAVISIDE = 32
+
+
+@lru_cache(maxsize=cache_size)
+def classify(expr, t):
+    """Return flags for the classes of function found in expr.  This
+    requires a single traversal of expr rather than one for each
+    class.  The result is cached, keyed by expr rather than its id
+    since ids can be reused once an expression is freed."""
+
+    Ht = None if t is None else sym.Heaviside(t)
+    mask = 0
+    for node in sym.preorder_traversal(expr):
+        if isinstance(node, sym.Integral):
+            mask |= INTEGRAL
+        elif isinstance(node, sym.function.AppliedUndef):
+            mask |= UNDEF
+        elif isinstance(node, sym.Derivative):
+            mask |= DERIVATIVE
+        elif isinstance(node, sym.DiracDelta):
+            mask |= DIRAC
+        elif isinstance(node, sym.Heaviside):
+            mask |= HEAVISIDE
+            if node == Ht:
+                mask |= HEAVISIDE_T
+    return mask
+
+
+def has_undef(expr):
+    """Return True if expr contains an undefined function such as V(s)."""
+
+    return classify(expr, None) & UNDEF != 0
+
+
+def laplace_term(expr, t, s, tsym=None):
 
     const, expr = factor_const(expr, t)
 
-    tsym = sympify(str(t))
-    expr = expr.replace(tsym, t)
+    # tsym is the symbol with the same name as t; it is passed by
+    # laplace_transform to avoid creating it for every term.
+    if tsym is None:
+        tsym = sympify(str(t))
+    if tsym != t:
+        expr = expr.replace(tsym, t)
 
-    if expr.has(sym.Integral):
+    mask = classify(expr, t)
+
+    if mask & INTEGRAL:
         return laplace_integral(expr, t, s) * const
 
-    if expr.has(sym.function.AppliedUndef):
+    if mask & UNDEF:
 
-        if expr.has(sym.Derivative):
+        if mask & DERIVATIVE:
             return laplace_derivative_undef(expr, t, s) * const    
 
         rest = sym.S.One
         expr = expr.cancel()
-        for factor in expr.as_ordered_factors():
+        for factor in sym.Mul.make_args(expr):
             if isinstance(factor, sym.function.AppliedUndef):
                 result = laplace_func(factor, t, s)
             else:
@@ -170,10 +234,10 @@ def laplace_term(expr, t, s):
                 rest *= factor
         return result * rest * const
 
-    if expr.has(sym.Heaviside(t)):
+    if mask & HEAVISIDE_T:
         return laplace_0(expr.replace(sym.Heaviside(t), 1), t, s) * const
 
-    if expr.has(sym.DiracDelta) or expr.has(sym.Heaviside):
+    if mask & (DIRAC | HEAVISIDE):
         try:
             return laplace_0minus(expr, t, s) * const
         except ValueError:
@@ -182,16 +246,74 @@ def laplace_term(expr, t, s):
     return laplace_0(expr, t, s) * const
 
 
-def laplace_transform(expr, t, s):
+def map_terms(func, terms, *args, **kwargs):
+    """Return list of func(term, *args, **kwargs) for each term.  The
+    terms are processed in parallel if n_jobs > 1 and there are at
+    least parallel_min_terms terms."""
+
+    if n_jobs > 1 and len(terms) >= parallel_min_terms:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(partial(apply_term, func, args, kwargs),
+                                   terms)
+            return [relink(result) for result in results]
+
+    return [func(term, *args, **kwargs) for term in terms]
+
+
+def apply_term(func, args, kwargs, term):
+    """Return func(term, *args, **kwargs); this is a module function so
+    that it can be pickled for map_terms."""
+
+    return func(term, *args, **kwargs)
+
+
+def relink(result):
+    """Replace the symbols in a result unpickled from another process
+    with the symbols of this process.  The unpickled symbols compare
+    equal but carry a stale hash."""
+
+    if isinstance(result, tuple):
+        return tuple(relink(part) for part in result)
+
+    rule = {symbol: sym.Symbol(symbol.name, **symbol.assumptions0)
+            for symbol in result.free_symbols}
+    return result.xreplace(rule)
+
+
+def needs_expand(term, t):
+    """Return True if term has a factor, or power of a factor, that is
+    a sum depending on t."""
+
+    for factor in sym.Mul.make_args(term):
+        base, exponent = factor.as_base_exp()
+        if base.is_Add and base.has(t):
+            return True
+    return False
+
+
+def laplace_transform(expr, t, s, simplify=None):
     """Compute unilateral Laplace transform of expr with lower limit 0-.
 
     Undefined functions such as v(t) are converted to V(s)
 
+    The result is only simplified if simplify is True.  If simplify
+    is None, this is determined by config.laplace_simplify.
+
     """
 
-    key = (expr, t, s)
-    if key in laplace_cache:
-        return laplace_cache[key]
+    if isinstance(expr, Expr):
+        expr = expr.expr
+    else:
+        expr = sympify(expr)
+
+    if simplify is None:
+        simplify = config.laplace_simplify
+
+    return _laplace_transform(expr, t, s, simplify)
+
+
+@lru_cache(maxsize=cache_size)
+def _laplace_transform(expr, t, s, simplify):
 
     if expr.has(s):
         raise ValueError('Cannot Laplace transform for expression %s that depends on %s' % (expr, s))
@@ -201,33 +323,39 @@ def laplace_transform(expr, t, s):
     # default to assuming that t is complex.  So if the symbol has the
     # same representation, convert to the desired one.
 
-    var = sym.Symbol(str(t))
-    if isinstance(expr, Expr):
-        expr = expr.expr
-    else:
-        expr = sympify(expr)
+    name = str(t)
+    var = sym.Symbol(name)
+    tsym = sympify(name)
 
     # SymPy laplace barfs on Piecewise but unilateral LT ignores expr
     # for t < 0 so remove Piecewise.
     expr = expr.replace(var, t)        
+    if tsym != t:
+        expr = expr.replace(tsym, t)
     if expr.is_Piecewise and expr.args[0].args[1].has(t >= 0):
         expr = expr.args[0].args[0]
 
-    expr = sym.expand(expr)        
-    terms = expr.as_ordered_terms()
+    # Only expand terms that have a sum in t as a factor, for example,
+    # (t + 1) * exp(-t).  Expanding the whole expression can be slow.
+    terms = []
+    for term in sym.Add.make_args(expr):
+        if needs_expand(term, t):
+            terms.extend(sym.Add.make_args(sym.expand(term)))
+        else:
+            terms.append(term)
     result = 0
 
-    try:
-        for term in terms:
-            result += laplace_term(term, t, s)
-    except ValueError:
-        raise
+    for term_result in map_terms(laplace_term, terms, t, s, t):
+        result += term_result
 
-    result = result.simplify()
-    laplace_cache[key] = result
+    if simplify:
+        result = result.simplify()
     return result
 
 
+laplace_transform.cache_clear = _laplace_transform.cache_clear
+
+
 def inverse_laplace_damped_sin(expr, s, t, **assumptions):
 
     ncoeffs, dcoeffs = expr.coeffs()
@@ -245,9 +373,9 @@ def inverse_laplace_damped_sin(expr, s, t, **assumptions):
     if zeta.is_constant() and zeta > 1:
         print('Warning: expression is overdamped')
 
-    sigma1 = (zeta * omega0).simplify()
-    omega1 = (omega0 * sym.sqrt(1 - zeta**2)).simplify()
-    K = (K / omega1).simplify()
+    sigma1 = zeta * omega0
+    omega1 = omega0 * sym.sqrt(1 - zeta**2)
+    K = K / omega1
 
     E = sym.exp(-sigma1 * t)
     S = sym.sin(omega1 * t)
@@ -276,6 +404,55 @@ def inverse_laplace_damped_sin(expr, s, t, **assumptions):
     return K * kCd * sym.DiracDelta(t), G
 
 
+def inverse_laplace_quadratics(N, D, s, t):
+    """Remove the terms of the partial fraction expansion of N / D for
+    irreducible quadratic factors of D that have complex roots.  These
+    are only found if N and D have rational coefficients.  This
+    returns the reduced numerator and denominator and the inverse
+    Laplace transform of the removed terms; these are damped
+    sinusoids and are found without determining the complex poles."""
+
+    result = sym.S.Zero
+
+    Npoly = sym.Poly(N, s)
+    Dpoly = sym.Poly(D, s)
+    if not (Npoly.domain.is_Numerical and Dpoly.domain.is_Numerical and
+            Npoly.domain.is_Exact and Dpoly.domain.is_Exact):
+        return N, D, result
+
+    const, factors = Dpoly.factor_list()
+    for q, n in factors:
+        if n != 1 or q.degree() != 2:
+            continue
+        q = q.monic()
+        _, b, c = q.all_coeffs()
+        if b**2 - 4 * c >= 0:
+            continue
+
+        # With D = q * R, N / D = P / q + N2 / R where P = N / R mod q.
+        R = Dpoly.exquo(q)
+        P = (Npoly * R.invert(q)).rem(q)
+        Npoly = (Npoly - P * R).exquo(q)
+        Dpoly = R
+
+        A, B = ([sym.S.Zero] + P.all_coeffs())[-2:]
+        sigma = b / 2
+        omega = sym.sqrt(c - sigma**2)
+        et = sym.exp(-sigma * t)
+        result += A * et * sym.cos(omega * t)
+        result += (B - A * sigma) / omega * et * sym.sin(omega * t)
+    return Npoly.as_expr(), Dpoly.as_expr(), result
+
+
+def dirac_derivative(t, order):
+    """Return the derivative of DiracDelta(t) of the specified order
+    without constructing a Derivative."""
+
+    if order == 0:
+        return sym.DiracDelta(t)
+    return sym.DiracDelta(t, order)
+
+
 def inverse_laplace_ratfun(expr, s, t, **assumptions):
 
     sexpr = Ratfun(expr, s)
@@ -293,24 +470,28 @@ def inverse_laplace_ratfun(expr, s, t, **assumptions):
     result1 = sym.S.Zero
 
     if Q:
-        Qpoly = sym.Poly(Q, s)        
-        C = Qpoly.all_coeffs()
-        for n, c in enumerate(C):
-            result1 += c * sym.diff(sym.DiracDelta(t), t, len(C) - n - 1)
+        # Poly.terms only gives the non-zero terms.  These are built
+        # first so that only one Add is created.
+        Qpoly = sym.Poly(Q, s)
+        result1 = sym.Add(*[c * dirac_derivative(t, k)
+                            for (k, ), c in Qpoly.terms()])
 
     expr = M / D
-    for factor in expr.as_ordered_factors():
+    for factor in sym.Mul.make_args(expr):
         if factor == sym.oo:
             return factor
 
-    sexpr = Ratfun(expr, s)
+    result2 = sym.S.Zero
+    if damping is None:
+        M, D, result2 = inverse_laplace_quadratics(M, D, s, t)
+        expr = M / D
+
+    sexpr = Ratfun.from_numer_denom(M, D, s)
     poles = sexpr.poles(damping=damping)
     polesdict = {}
     for pole in poles:
         polesdict[pole.expr] = pole.n
     
-    result2 = sym.S.Zero
-
     for pole in poles:
 
         p = pole.expr
@@ -344,13 +525,28 @@ def inverse_laplace_ratfun(expr, s, t, **assumptions):
                 result2 += r * sym.exp(p * t)
             continue
 
-        # Handle repeated poles.
-        expr2 = expr * (s - p) ** o
-        for n in range(1, o + 1):
-            m = o - n
-            r = sym.limit(
-                sym.diff(expr2, s, m), s, p) / sym.factorial(m)
-            result2 += r * sym.exp(p * t) * t**(n - 1)
+        # Handle repeated poles.  The coefficient of 1 / (s - p)**n
+        # is the coefficient of (s - p)**(o - n) in the Taylor series
+        # of expr * (s - p)**o about p and this transforms to
+        # t**(n - 1) * exp(p * t) / (n - 1)!.  The pole is removed
+        # by exact polynomial division of the denominator since
+        # cancel cannot remove complex or algebraic poles.  The
+        # Taylor coefficients are then found by substitution, with a
+        # limit as a last resort.
+        Dquo, Drem = sym.div(D, (s - p) ** o, s)
+        if Drem == 0:
+            expr2 = M / Dquo
+        else:
+            expr2 = sym.cancel(expr * (s - p) ** o)
+        dexpr2 = expr2
+        for m in range(o):
+            r = sym.expand(dexpr2.subs(s, p))
+            if r.has(sym.nan, sym.zoo, sym.oo, -sym.oo):
+                r = sym.limit(dexpr2, s, p)
+            r = r / sym.factorial(m)
+            n = o - m
+            result2 += r * sym.exp(p * t) * t**(n - 1) / sym.factorial(n - 1)
+            dexpr2 = sym.diff(dexpr2, s)
 
     # result1 is a sum of Dirac deltas and its derivatives so is known
     # to be causal.
@@ -384,6 +580,19 @@ def inverse_laplace_product(expr, s, t, **assumptions):
     if len(factors) < 2:
         raise ValueError('Expression does not have multiple factors: %s' % expr)
 
+    # Combine the rational functions of s into a single factor so that
+    # they are inverted together by partial fraction expansion rather
+    # than by nested convolutions.
+    rational = []
+    others = []
+    for factor in factors:
+        if factor.is_rational_function(s):
+            rational.append(factor)
+        else:
+            others.append(factor)
+    if len(rational) > 1:
+        factors = [sym.cancel(sym.Mul(*rational))] + others
+
     if (len(factors) > 2 and not
         # Help s * 1 / (s + R * C) * I(s)
         isinstance(factors[1], sym.function.AppliedUndef) and
@@ -392,7 +601,7 @@ def inverse_laplace_product(expr, s, t, **assumptions):
     
     if isinstance(factors[1], sym.function.AppliedUndef):
         # Try to expose more simple cases, e.g. (R + s * L) * V(s)
-        terms = factors[0].as_ordered_terms()
+        terms = sym.Add.make_args(factors[0])
         if len(terms) >= 2:
             result = sym.S.Zero
             for term in terms:
@@ -447,6 +656,9 @@ def inverse_laplace_power(expr, s, t, **assumptions):
     # s**a, s**-a, s**(1+a), s**(1-a), s**-(1+a), s**(a-1)
     # Cannot tell if 1-a is positive.
 
+    if exponent.is_Integer and exponent > 0:
+        return dirac_derivative(t, int(exponent))
+
     if exponent.is_positive:
         # Unfortunately, SymPy does not seem to support fractional
         # derivatives...
@@ -460,21 +672,26 @@ def inverse_laplace_power(expr, s, t, **assumptions):
 def delay_factor(expr, var):
 
     delay = sym.S.Zero    
-    rest = sym.S.One
-    
-    for f in expr.as_ordered_factors():
-        b, e = f.as_base_exp()
-        if b == sym.E and e.is_polynomial(var):
-            p = sym.Poly(e, var)
-            c = p.all_coeffs()
-            if p.degree() == 1:
-                delay -= c[0]
-                if c[1] != 0:
-                    rest *= sym.exp(c[1])
-                continue
 
-        rest *= f
-    return rest, delay
+    # Most expressions do not have a delay.
+    if not expr.has(sym.exp):
+        return expr, delay
+
+    rest = []
+    for f in sym.Mul.make_args(expr):
+        if isinstance(f, sym.exp):
+            e = f.args[0]
+            if e.is_polynomial(var):
+                p = sym.Poly(e, var)
+                c = p.all_coeffs()
+                if p.degree() == 1:
+                    delay -= c[0]
+                    if c[1] != 0:
+                        rest.append(sym.exp(c[1]))
+                    continue
+
+        rest.append(f)
+    return sym.Mul(*rest), delay
 
 
 def inverse_laplace_sympy(expr, s, t):
@@ -500,20 +717,21 @@ def inverse_laplace_term1(expr, s, t, **assumptions):
         result = laplace_func(expr, s, t, True)
         return result * const, sym.S.Zero
     
-    if expr.has(sym.function.AppliedUndef):
+    if has_undef(expr):
         return const * inverse_laplace_product(expr, s, t,
                                                **assumptions), sym.S.Zero
 
-    try:
-        # This is the common case.
-        result1, result2 = inverse_laplace_ratfun(expr, s, t, **assumptions)
-        return const * result1, const * result2
-    except:
-        pass
+    if expr.is_rational_function(s):
+        try:
+            # This is the common case.
+            result1, result2 = inverse_laplace_ratfun(expr, s, t, **assumptions)
+            return const * result1, const * result2
+        except (ValueError, NotImplementedError, sym.PolynomialError):
+            pass
 
     try:
-        return sym.S.Zero, const * inverse_laplace_sympy(expr, s, t, **assumptions)
-    except:
+        return sym.S.Zero, const * inverse_laplace_sympy(expr, s, t)
+    except (ValueError, NotImplementedError, sym.PolynomialError):
         pass
 
     if expr.is_Pow and expr.args[0] == s:
@@ -527,6 +745,12 @@ def inverse_laplace_term(expr, s, t, **assumptions):
 
     expr, delay = delay_factor(expr, s)
 
+    if (delay == 0 and expr.has(sym.exp)
+        and not expr.is_rational_function(s)):
+        # A delay may be hidden in a sum, such as in
+        # 1 / (s * exp(s) + exp(s)), so try factoring it out.
+        expr, delay = delay_factor(sym.factor(expr), s)
+
     result1, result2 = inverse_laplace_term1(expr, s, t, **assumptions)
 
     if delay != 0:
@@ -544,13 +768,13 @@ def inverse_laplace_term(expr, s, t, **assumptions):
 
 def inverse_laplace_by_terms(expr, s, t, **assumptions):
 
-    terms = expr.as_ordered_terms()
+    terms = sym.Add.make_args(expr)
 
     result1 = sym.S.Zero
     result2 = sym.S.Zero    
 
-    for term in terms:
-        part1, part2 = inverse_laplace_term(term, s, t, **assumptions)
+    for part1, part2 in map_terms(inverse_laplace_term, terms, s, t,
+                                  **assumptions):
         result1 += part1
         result2 += part2        
     return result1, result2
@@ -568,15 +792,25 @@ def inverse_laplace_transform(expr, s, t, **assumptions):
     ac -- x(t) = A cos(a * t) + B * sin(b * t)
     """
 
-    # TODO, simplify
-    key = (expr, s, t, assumptions.get('dc', False),
-           assumptions.get('ac', False),
-           assumptions.get('causal', False),
-           assumptions.get('damping', None),           
-           assumptions.get('damped_sin', None))
-    
-    if key in inverse_laplace_cache:
-        return inverse_laplace_cache[key]
+    # Only the assumptions used for the transform are passed
+    # so that they form part of the cache key.  The flags are only
+    # tested for truth so they are converted to bool; otherwise, say,
+    # causal=None and causal=False would be cached separately.
+    return _inverse_laplace_transform(expr, s, t,
+                                      bool(assumptions.get('dc', False)),
+                                      bool(assumptions.get('ac', False)),
+                                      bool(assumptions.get('causal', False)),
+                                      assumptions.get('damping', None),
+                                      bool(assumptions.get('damped_sin',
+                                                           False)))
+
+
+@lru_cache(maxsize=cache_size)
+def _inverse_laplace_transform(expr, s, t, dc, ac, causal, damping,
+                               damped_sin):
+
+    assumptions = {'dc': dc, 'ac': ac, 'causal': causal,
+                   'damping': damping, 'damped_sin': damped_sin}
 
     if expr.has(t):
         raise ValueError('Cannot inverse Laplace transform for expression %s that depends on %s' % (expr, t))
@@ -612,7 +846,9 @@ def inverse_laplace_transform(expr, s, t, **assumptions):
     elif not assumptions.get('causal', False):
         result = sym.Piecewise((result, t >= 0))
         
-    inverse_laplace_cache[key] = result
     return result
 
+
+inverse_laplace_transform.cache_clear = _inverse_laplace_transform.cache_clear
+
 from .expr import Expr
@@ -25,6 +25,9 @@ class Network(object):
     netname = ''
     netkeyword = ''
 
+    # Counter for numbering the nodes when creating a netlist.
+    node_counter = 0
+
     def __init__(self):
 
         super(Network, self).__init__()
@@ -87,17 +90,21 @@ class Network(object):
             self._add(net)
 
         # Hack, create ground reference.
-        self._add('W %d 0' % (self.node - 1))
+        self._add('W %d 0' % (self.node_counter - 1))
 
-    @property 
-    def node(self):
+    def next_node(self):
+        """Return the next unused node number."""
 
-        if not hasattr(self, 'node_counter'):
-            self.node_counter = 0
         ret = self.node_counter
         self.node_counter += 1
         return ret
 
+    @property 
+    def node(self):
+        """The next unused node number; this is an alias for next_node()."""
+
+        return self.next_node()
+
     def netargs(self):
 
         def quote(arg):
@@ -112,9 +119,9 @@ class Network(object):
     def net_make(self, net, n1=None, n2=None):
 
         if n1 == None:
-            n1 = net.node
+            n1 = net.next_node()
         if n2 == None:
-            n2 = net.node
+            n2 = net.next_node()
 
         netname = self.__class__.__name__ if self.netname == '' else self.netname
 
@@ -126,11 +133,18 @@ class Network(object):
 
     def netlist(self):
 
+        # The netlist is cached since a network is not modified once
+        # created and it is used to create both the schematic and
+        # the circuit.
+        if hasattr(self, '_netlist'):
+            return self._netlist
+
         # Enumerate from node 0
         self.node_counter = 0
-        n1 = self.node
-        n2 = self.node        
-        return self.net_make(self, n2, n1)
+        n1 = self.next_node()
+        n2 = self.next_node()
+        self._netlist = self.net_make(self, n2, n1)
+        return self._netlist
 
 
     @property
@@ -25,10 +25,10 @@ class omegaExpr(Expr):
         super(omegaExpr, self).__init__(val, **assumptions)
         self._fourier_conjugate_class = tExpr
 
-        if self.expr.find(ssym) != set():
+        if self.expr.has(ssym):
             raise ValueError(
                 'omega-domain expression %s cannot depend on s' % self.expr)
-        if self.expr.find(tsym) != set():
+        if self.expr.has(tsym):
             raise ValueError(
                 'omega-domain expression %s cannot depend on t' % self.expr)
 
@@ -26,12 +26,14 @@ Copyright 2014--2019 Michael Hayes, UCECE
 
 
 from __future__ import division
+from functools import cached_property
 from .functions import Heaviside, cos, exp
-from .symbols import j, t, s
+from .symbols import j, t, s, omega as omega0
 from .network import Network
 from .immitance import ImmitanceMixin
 from .impedance import Impedance
 from .admittance import Admittance
+import sympy as sym
 
 
 __all__ = ('V', 'I', 'v', 'i', 'R', 'L', 'C', 'G', 'Y', 'Z',
@@ -39,6 +41,16 @@ __all__ = ('V', 'I', 'v', 'i', 'R', 'L', 'C', 'G', 'Y', 'Z',
            'Iac', 'Vnoise', 'Inoise', 
            'Par', 'Ser', 'Xtal', 'FerriteBead', 'CPE')
 
+def _is_equal(value1, value2):
+    """Return True if the expressions value1 and value2 are equal.  The
+    common case of structurally identical expressions is checked
+    first."""
+
+    if value1.expr == value2.expr:
+        return True
+    return value1 == value2
+
+
 def _check_oneport_args(args):
 
     for arg1 in args:
@@ -65,6 +77,9 @@ class OnePort(Network, ImmitanceMixin):
       z = z(t)  impulse response of impedance
       voc = voc(t) open-circuit voltage time response
       isc = isc(t) short-circuit current time response
+
+    The time-domain attributes are computed when first accessed and
+    then cached since a one-port is not modified once created.
     """
 
     # Dimensions and separations of component with horizontal orientation.
@@ -86,8 +101,9 @@ class OnePort(Network, ImmitanceMixin):
             return Impedance(1 / self._Y)
         if self._Voc is not None:        
             return Impedance(0)
-        if self._Isc is not None:        
-            return Impedance(1 / Admittance(0))
+        if self._Isc is not None:
+            # Infinite impedance, without forming 1 / Admittance(0).
+            return Impedance(sym.zoo)
         raise ValueError('_Isc, _Voc, _Y, or _Z undefined for %s' % self)
 
     @property
@@ -126,7 +142,7 @@ class OnePort(Network, ImmitanceMixin):
         """Open-circuit current.  Except for a current source this is zero."""
         return Current(0)
 
-    @property
+    @cached_property
     def i(self):
         """Open-circuit time-domain current.  Except for a current source this
         is zero."""
@@ -160,7 +176,7 @@ class OnePort(Network, ImmitanceMixin):
     def lsection(self, OP2):
         """Create L section (voltage divider)"""
 
-        if not issubclass(OP2.__class__, OnePort):
+        if not isinstance(OP2, OnePort):
             raise TypeError('Argument not ', OnePort)
 
         return LSection(self, OP2)
@@ -168,10 +184,10 @@ class OnePort(Network, ImmitanceMixin):
     def tsection(self, OP2, OP3):
         """Create T section"""
 
-        if not issubclass(OP2.__class__, OnePort):
+        if not isinstance(OP2, OnePort):
             raise TypeError('Argument not ', OnePort)
 
-        if not issubclass(OP3.__class__, OnePort):
+        if not isinstance(OP3, OnePort):
             raise TypeError('Argument not ', OnePort)
 
         return TSection(self, OP2, OP3)
@@ -182,32 +198,32 @@ class OnePort(Network, ImmitanceMixin):
 
     def load(self, OP2):
 
-        if not issubclass(OP2.__class__, OnePort):
+        if not isinstance(OP2, OnePort):
             raise TypeError('Load argument not ', OnePort)
 
         return LoadCircuit(self, OP2)
     
-    @property
+    @cached_property
     def voc(self):
         """Open-circuit time-domain voltage."""
         return self.Voc.time()
 
-    @property
+    @cached_property
     def isc(self):
         """Short-circuit time-domain current."""        
         return self.Isc.time()
 
-    @property
+    @cached_property
     def v(self):
         """Open-circuit time-domain voltage."""
         return self.voc
 
-    @property
+    @cached_property
     def z(self):
         """Impedance impulse-response."""
         return self.impedance.time()
 
-    @property
+    @cached_property
     def y(self):
         """Admittance impulse-response."""        
         return self.admittance.time()
@@ -215,6 +231,13 @@ class OnePort(Network, ImmitanceMixin):
     def thevenin(self):
         """Simplify to a Thevenin network"""
 
+        if hasattr(self, '_thevenin'):
+            return self._thevenin
+        self._thevenin = self._make_thevenin()
+        return self._thevenin
+
+    def _make_thevenin(self):
+
         new = self.simplify()
         Voc = new.Voc
         Z = new.impedance
@@ -225,8 +248,9 @@ class OnePort(Network, ImmitanceMixin):
             Z1 = Z
             V1 = Voc.laplace()
         elif Voc.is_ac:
-            Z1 = Z.subs(j * Voc.ac_keys()[0])
-            V1 = Voc.select(Voc.ac_keys()[0])
+            omega1 = Voc.ac_keys()[0]
+            Z1 = Z.subs(j * omega1)
+            V1 = Voc.select(omega1)
         elif Voc.is_dc:
             Z1 = Z.subs(0)
             V1 = Voc(0)
@@ -237,9 +261,9 @@ class OnePort(Network, ImmitanceMixin):
         V1 = V1.cpt()
         Z1 = Z1.cpt()        
 
-        if Voc == 0:
+        if _is_zero(Voc):
             return Z1
-        if Z == 0:
+        if _is_zero(Z):
             return V1
 
         return Ser(Z1, V1)
@@ -247,6 +271,13 @@ class OnePort(Network, ImmitanceMixin):
     def norton(self):
         """Simplify to a Norton network"""
 
+        if hasattr(self, '_norton'):
+            return self._norton
+        self._norton = self._make_norton()
+        return self._norton
+
+    def _make_norton(self):
+
         new = self.simplify()
         Isc = new.Isc
         Y = new.admittance
@@ -257,8 +288,9 @@ class OnePort(Network, ImmitanceMixin):
             Y1 = Y
             I1 = Isc.laplace()
         elif Isc.is_ac:
-            Y1 = Y.subs(j * Isc.ac_keys()[0])
-            I1 = Isc.select(Isc.ac_keys()[0])
+            omega1 = Isc.ac_keys()[0]
+            Y1 = Y.subs(j * omega1)
+            I1 = Isc.select(omega1)
         elif Isc.is_dc:
             Y1 = Y.subs(0)
             I1 = Isc(0)
@@ -269,9 +301,9 @@ class OnePort(Network, ImmitanceMixin):
         I1 = I1.cpt()
         Y1 = Y1.cpt()        
             
-        if Isc == 0:
+        if _is_zero(Isc):
             return Y1
-        if Y == 0:
+        if _is_zero(Y):
             return I1
 
         return Par(Y1, I1)
@@ -280,17 +312,17 @@ class OnePort(Network, ImmitanceMixin):
         """Convert to s-domain."""
 
         if self._Voc is not None:
-            if self._Voc == 0:
+            if _is_zero(self._Voc):
                 return Z(self.impedance)
             Voc = self._Voc.laplace()
-            if self.Z == 0:
+            if _is_zero(self.Z):
                 return V(Voc)
             return Ser(V(Voc), Z(self.impedance))
         elif self._Isc is not None:
-            if self._Isc == 0:
+            if _is_zero(self._Isc):
                 return Y(self.admittance)
             Isc = self._Isc.laplace()
-            if self.admittance == 0:
+            if _is_zero(self.admittance):
                 return I(Isc)
             return Par(I(Isc), Y(self.admittance))
         elif self._Z is not None:
@@ -302,14 +334,12 @@ class OnePort(Network, ImmitanceMixin):
     def noise_model(self):
         """Convert to noise model."""
 
-        from .symbols import omega
-
         if not isinstance(self, (R, G, Y, Z)):
             return self
         
         R1 = self.R
-        if R1 != 0:
-            Vn = Vnoise('sqrt(4 * k * T * %s)' % R1(j * omega))
+        if not _is_zero(R1):
+            Vn = Vnoise('sqrt(4 * k * T * %s)' % R1(j * omega0))
             return self + Vn
         return self
 
@@ -317,22 +347,24 @@ class OnePort(Network, ImmitanceMixin):
 class ParSer(OnePort):
     """Parallel/serial class"""
 
-    def __str__(self):
-
-        str = ''
+    def _render(self, method):
+        """Join the strings created by method for each arg with the
+        operator, bracketing args of the other ParSer class."""
 
-        for m, arg in enumerate(self.args):
-            argstr = arg.__str__()
+        cls = self.__class__
+        parts = []
+        for arg in self.args:
+            argstr = getattr(arg, method)()
 
-            if isinstance(arg, ParSer) and arg.__class__ != self.__class__:
+            if isinstance(arg, ParSer) and arg.__class__ != cls:
                 argstr = '(' + argstr + ')'
+            parts.append(argstr)
 
-            str += argstr
+        return (' %s ' % self._operator).join(parts)
 
-            if m != len(self.args) - 1:
-                str += ' %s ' % self._operator
+    def __str__(self):
 
-        return str
+        return self._render('__str__')
 
     def _repr_pretty_(self, p, cycle):
 
@@ -344,20 +376,7 @@ class ParSer(OnePort):
 
     def pretty(self):
 
-        str = ''
-
-        for m, arg in enumerate(self.args):
-            argstr = arg.pretty()
-
-            if isinstance(arg, ParSer) and arg.__class__ != self.__class__:
-                argstr = '(' + argstr + ')'
-
-            str += argstr
-
-            if m != len(self.args) - 1:
-                str += ' %s ' % self._operator
-
-        return str
+        return self._render('pretty')
 
     def pprint(self):
 
@@ -365,95 +384,7 @@ class ParSer(OnePort):
 
     def latex(self):
 
-        str = ''
-
-        for m, arg in enumerate(self.args):
-            argstr = arg.latex()
-
-            if isinstance(arg, ParSer) and arg.__class__ != self.__class__:
-                argstr = '(' + argstr + ')'
-
-            str += argstr
-
-            if m != len(self.args) - 1:
-                str += ' %s ' % self._operator
-
-        return str
-
-    def _combine(self, arg1, arg2):
-
-        if arg1.__class__ != arg2.__class__:
-            if self.__class__ == Ser:
-                if isinstance(arg1, V) and arg1.Voc == 0:
-                    return arg2
-                if isinstance(arg2, V) and arg2.Voc == 0:
-                    return arg1
-                if isinstance(arg1, (R, Z)) and arg1.impedance == 0:
-                    return arg2
-                if isinstance(arg2, (R, Z)) and arg2.impedance == 0:
-                    return arg1
-            if self.__class__ == Par:
-                if isinstance(arg1, I) and arg1.Isc == 0:
-                    return arg2
-                if isinstance(arg2, I) and arg2.Isc == 0:
-                    return arg1
-                if isinstance(arg1, (Y, G)) and arg1.admittance == 0:
-                    return arg2
-                if isinstance(arg2, (Y, G)) and arg2.admittance == 0:
-                    return arg1
-
-            return None
-
-        if self.__class__ == Ser:
-            if isinstance(arg1, I):
-                return None
-            if isinstance(arg1, Vdc):
-                return Vdc(arg1.v0 + arg2.v0)
-            # Could simplify Vac here if same frequency
-            if isinstance(arg1, V):
-                return V(arg1 + arg2)
-            if isinstance(arg1, R):
-                return R(arg1._R + arg2._R)
-            if isinstance(arg1, L):
-                # The currents should be the same!
-                if arg1.i0 != arg2.i0 or arg1.hasic != arg2.hasic:
-                    raise ValueError('Series inductors with different'
-                          ' initial currents!')
-                i0 = arg1.i0 if arg1.hasic else None
-                return L(arg1.L + arg2.L, i0)
-            if isinstance(arg1, G):
-                return G(arg1._G * arg2._G / (arg1._G + arg2._G))
-            if isinstance(arg1, C):
-                v0 = arg1.v0 + arg2.v0 if arg1.hasic or arg2.hasic else None
-                return C(arg1.C * arg2.C / (arg1.C + arg2.C), v0)
-            return None
-
-        elif self.__class__ == Par:
-            if isinstance(arg1, V):
-                return None
-            if isinstance(arg1, Idc):
-                return Idc(arg1.i0 + arg2.i0)
-            # Could simplify Iac here if same frequency
-            if isinstance(arg1, I):
-                return I(arg1 + arg2)
-            if isinstance(arg1, G):
-                return G(arg1._G + arg2._G)
-            if isinstance(arg1, C):
-                # The voltages should be the same!
-                if arg1.v0 != arg2.v0 or arg1.hasic != arg2.hasic:
-                    raise ValueError('Parallel capacitors with different'
-                          ' initial voltages!')
-                v0 = arg1.v0 if arg1.hasic else None
-                return C(arg1.C + arg2.C, v0)
-            if isinstance(arg1, R):
-                return R(arg1._R * arg2._R / (arg1._R + arg2._R))
-            if isinstance(arg1, L):
-                i0 = arg1.i0 + arg2.i0 if arg1.hasic or arg2.hasic else None
-                return L(arg1.L * arg2.L / (arg1.L + arg2.L), i0)
-            return None
-
-        else:
-            raise TypeError('Undefined class')
+        return self._render('latex')
 
     def simplify(self, deep=True):
         """Perform simple simplifications, such as parallel resistors,
@@ -466,13 +397,14 @@ class ParSer(OnePort):
 
         # Simplify args (recursively) and combine operators if have
         # Par(Par(A, B), C) etc.
+        cls = self.__class__
         new = False
         newargs = []
-        for m, arg in enumerate(self.args):
+        for arg in self.args:
             if isinstance(arg, ParSer):
                 arg = arg.simplify(deep)
                 new = True
-                if arg.__class__ == self.__class__:
+                if arg.__class__ == cls:
                     newargs.extend(arg.args)
                 else:
                     newargs.append(arg)
@@ -480,27 +412,46 @@ class ParSer(OnePort):
                 newargs.append(arg)
 
         if new:
-            self = self.__class__(*newargs)
+            self = cls(*newargs)
 
-        # Scan arg list looking for compatible combinations.
-        # Could special case the common case of two args.
+        # Combine args of the same class first since, apart from
+        # sources and immittances of zero value, only these can be
+        # combined.  Each arg is combined with the first arg of its
+        # class, found by a dictionary lookup, so the pairwise scan
+        # below only needs to consider one arg per class.
         new = False
-        args = list(self.args)
-        for n in range(len(args)):
+        args = []
+        first = {}
+        for arg in self.args:
+            if not isinstance(arg, ParSer):
+                n = first.get(arg.__class__)
+                if n is not None:
+                    newarg = self._combine(args[n], arg)
+                    if newarg is not None:
+                        args[n] = newarg
+                        new = True
+                        continue
+                else:
+                    first[arg.__class__] = len(args)
+            args.append(arg)
+
+        # Scan arg list looking for compatible combinations.  Only
+        # args that are not ParSer can be combined so find their
+        # indices once rather than for every pair.
+        # Could special case the common case of two args.
+        leaves = [n for n, arg in enumerate(args)
+                  if not isinstance(arg, ParSer)]
+        for k, n in enumerate(leaves):
 
             arg1 = args[n]
             if arg1 is None:
                 continue
-            if isinstance(arg1, ParSer):
-                continue
 
-            for m in range(n + 1, len(args)):
+            for m in leaves[k + 1:]:
 
                 arg2 = args[m]
                 if arg2 is None:
                     continue
-                if isinstance(arg2, ParSer):
-                    continue
 
                 # TODO, think how to simplify things such as
                 # Par(Ser(V1, R1), Ser(R2, V2)).
@@ -519,7 +470,7 @@ class ParSer(OnePort):
             args = [arg for arg in args if arg is not None]
             if len(args) == 1:
                 return args[0]
-            self = self.__class__(*args)
+            self = cls(*args)
 
         return self
 
@@ -544,11 +495,11 @@ class ParSer(OnePort):
         args = [arg.noise_model() for arg in self.args]
         return (self.__class__(*args))
 
-    @property
+    @cached_property
     def Isc(self):
         return self.cct.Isc(1, 0)
 
-    @property
+    @cached_property
     def Voc(self):
         return self.cct.Voc(1, 0)
 
@@ -597,9 +548,10 @@ class Par(ParSer):
     def net_make(self, net, n1=None, n2=None):
 
         s = []
+        wsep = self.wsep
         if n1 is None:
-            n1 = net.node
-        n3, n4 =  net.node, net.node
+            n1 = net.next_node()
+        n3, n4 =  net.next_node(), net.next_node()
 
         H = [(arg.height + self.hsep) * 0.5 for arg in self.args]
         
@@ -612,9 +564,10 @@ class Par(ParSer):
 
         na, nb = n3, n4
 
-        s.append('W %s %s; right=%s' % (n1, n3, self.wsep))
+        s.append('W %s %s; right=%s' % (n1, n3, wsep))
 
         # Draw components above centre
+        upfmt = 'W %s %s; up=%s'
         for n in range(num_branches):
 
             if not (N & 1) and n == 0:
@@ -622,15 +575,16 @@ class Par(ParSer):
             else:
                 sep = H[N // 2 - n] + H[N // 2 - 1 - n]
 
-            nc, nd =  net.node, net.node
-            s.append('W %s %s; up=%s' % (na, nc, sep))
-            s.append('W %s %s; up=%s' % (nb, nd, sep))
+            nc, nd =  net.next_node(), net.next_node()
+            s.append(upfmt % (na, nc, sep))
+            s.append(upfmt % (nb, nd, sep))
             s.append(self.args[N // 2 - 1 - n].net_make(net, nc, nd))
             na, nb = nc, nd
 
         na, nb = n3, n4
 
         # Draw components below centre
+        downfmt = 'W %s %s; down=%s'
         for n in range(num_branches):
 
             if not (N & 1) and n == 0:
@@ -638,26 +592,43 @@ class Par(ParSer):
             else:
                 sep = H[(N + 1) // 2 + n] + H[(N + 1) // 2 - 1 + n]
 
-            nc, nd =  net.node, net.node
-            s.append('W %s %s; down=%s' % (na, nc, sep))
-            s.append('W %s %s; down=%s' % (nb, nd, sep))
+            nc, nd =  net.next_node(), net.next_node()
+            s.append(downfmt % (na, nc, sep))
+            s.append(downfmt % (nb, nd, sep))
             s.append(self.args[(N + 1) // 2 + n].net_make(net, nc, nd))
             na, nb = nc, nd
 
         if n2 is None:
-            n2 = net.node
+            n2 = net.next_node()
 
-        s.append('W %s %s; right=%s' % (n4, n2, self.wsep))
+        s.append('W %s %s; right=%s' % (n4, n2, wsep))
         return '\n'.join(s)
 
-    @property
-    def admittance(self):
-        Y = 0
-        for arg in self.args:
-            Y += arg.admittance
-        return Admittance(Y)
+    def _combine(self, arg1, arg2):
 
-    @property
+        if arg1.__class__ != arg2.__class__:
+            if isinstance(arg1, I) and _is_zero(arg1.Isc):
+                return arg2
+            if isinstance(arg2, I) and _is_zero(arg2.Isc):
+                return arg1
+            if isinstance(arg1, (Y, G)) and _is_zero(arg1.admittance):
+                return arg2
+            if isinstance(arg2, (Y, G)) and _is_zero(arg2.admittance):
+                return arg1
+            return None
+
+        return _combine_same(_parallel_combiners, arg1, arg2)
+
+    @cached_property
+    def admittance(self):
+        # Sum the admittances with a single Add rather than creating
+        # an intermediate Expr for each partial sum.  Zero terms,
+        # such as those of sources, are dropped first.
+        terms = [arg.admittance.expr for arg in self.args]
+        return Admittance(sym.Add(*[term for term in terms
+                                    if term is not sym.S.Zero]))
+
+    @cached_property
     def impedance(self):
         return Impedance(1 / self.admittance)
 
@@ -704,29 +675,47 @@ class Ser(ParSer):
     def net_make(self, net, n1=None, n2=None):
 
         s = []
+        wire = 'W %%s %%s; right=%s' % self.wsep
         if n1 is None:
-            n1 = net.node
+            n1 = net.next_node()
         for arg in self.args[:-1]:
-            n3 = net.node
+            n3 = net.next_node()
             s.append(arg.net_make(net, n1, n3))
-            n1 = net.node
-            s.append('W %s %s; right=%s' % (n3, n1, self.wsep))
+            n1 = net.next_node()
+            s.append(wire % (n3, n1))
 
         if n2 is None:
-            n2 = net.node
+            n2 = net.next_node()
         s.append(self.args[-1].net_make(net, n1, n2))
         return '\n'.join(s)
 
+    def _combine(self, arg1, arg2):
+
+        if arg1.__class__ != arg2.__class__:
+            if isinstance(arg1, V) and _is_zero(arg1.Voc):
+                return arg2
+            if isinstance(arg2, V) and _is_zero(arg2.Voc):
+                return arg1
+            if isinstance(arg1, (R, Z)) and _is_zero(arg1.impedance):
+                return arg2
+            if isinstance(arg2, (R, Z)) and _is_zero(arg2.impedance):
+                return arg1
+            return None
+
+        return _combine_same(_series_combiners, arg1, arg2)
+
     @property
     def Admittance(self):
         return Admittance(1 / self.impedance)
     
-    @property
+    @cached_property
     def impedance(self):
-        Z = 0
-        for arg in self.args:
-            Z += arg.impedance
-        return Impedance(Z)
+        # Sum the impedances with a single Add rather than creating
+        # an intermediate Expr for each partial sum.  Zero terms,
+        # such as those of sources, are dropped first.
+        terms = [arg.impedance.expr for arg in self.args]
+        return Impedance(sym.Add(*[term for term in terms
+                                   if term is not sym.S.Zero]))
 
     
 class R(OnePort):
@@ -751,9 +740,9 @@ class G(OnePort):
     def net_make(self, net, n1=None, n2=None):
 
         if n1 == None:
-            n1 = net.node
+            n1 = net.next_node()
         if n2 == None:
-            n2 = net.node
+            n2 = net.next_node()
         return 'R %s %s {%s}; right' % (n1, n2, 1 / self._G)
 
 
@@ -779,7 +768,7 @@ class L(OnePort):
         self.i0 = i0
         self._Z = Impedance(s * Lval)
         self._Voc = Voltage(-Vs(i0 * Lval))
-        self.zeroic = self.i0 == 0 
+        self.zeroic = _is_zero(self.i0)
 
 
 class C(OnePort):
@@ -804,7 +793,7 @@ class C(OnePort):
         self.v0 = v0
         self._Z = Impedance(1 / (s * Cval))
         self._Voc = Voltage(Vs(v0) / s)
-        self.zeroic = self.v0 == 0
+        self.zeroic = _is_zero(self.v0)
 
 
 class CPE(OnePort):
@@ -932,7 +921,7 @@ class Vac(VoltageSource):
             phi = 0
             
         if omega is None:
-            from .symbols import omega
+            omega = omega0
         else:
             omega = Expr(omega)
 
@@ -944,11 +933,17 @@ class Vac(VoltageSource):
         self.omega = omega
         self.v0 = V
         self.phi = phi
-        self._Voc = Voltage(Vphasor(self.v0 * exp(j * self.phi),
-                                   ac=True, omega=self.omega))
+        # Only form the phase factor when there is a phase shift.
+        if phi.expr is sym.S.Zero:
+            phasor = self.v0
+        else:
+            phasor = self.v0 * exp(j * self.phi)
+        self._Voc = Voltage(Vphasor(phasor, ac=True, omega=self.omega))
 
-    @property
+    @cached_property
     def voc(self):
+        if self.phi.expr is sym.S.Zero:
+            return self.v0 * cos(self.omega * t)
         return self.v0 * cos(self.omega * t + self.phi)
 
 
@@ -1060,7 +1055,7 @@ class Iac(CurrentSource):
             phi = 0
             
         if omega is None:
-            from .symbols import omega            
+            omega = omega0
         else:
             omega = Expr(omega)
 
@@ -1070,11 +1065,17 @@ class Iac(CurrentSource):
         self.omega = omega
         self.i0 = I
         self.phi = phi
-        self._Isc = Current(Iphasor(self.i0 * exp(j * self.phi),
-                                   ac=True, omega=self.omega))
+        # Only form the phase factor when there is a phase shift.
+        if phi.expr is sym.S.Zero:
+            phasor = self.i0
+        else:
+            phasor = self.i0 * exp(j * self.phi)
+        self._Isc = Current(Iphasor(phasor, ac=True, omega=self.omega))
 
-    @property
+    @cached_property
     def isc(self):
+        if self.phi.expr is sym.S.Zero:
+            return self.i0 * cos(self.omega * t)
         return self.i0 * cos(self.omega * t + self.phi)
 
 
@@ -1116,7 +1117,11 @@ class Xtal(OnePort):
         self.L1 = cExpr(L1)
         self.C1 = cExpr(C1)
 
-        self._Z = self.expand().impedance
+        # Form the impedance of the expanded network directly rather
+        # than building and combining the network.
+        ssym = s.expr
+        Z1 = self.R1.expr + self.L1.expr * ssym + 1 / (self.C1.expr * ssym)
+        self._Z = Impedance(1 / (self.C0.expr * ssym + 1 / Z1))
         self.args = (C0, R1, L1, C1)
 
     def expand(self):
@@ -1126,8 +1131,7 @@ class Xtal(OnePort):
     def net_make(self, net, n1=None, n2=None):
 
         # TODO: draw this with a symbol
-        net = self.expand()
-        return net.net_make(net, n1, n2)    
+        return self.expand().net_make(net, n1, n2)
 
 
 class FerriteBead(OnePort):
@@ -1144,18 +1148,21 @@ class FerriteBead(OnePort):
         self.Cp = cExpr(Cp)
         self.Lp = cExpr(Lp)
 
-        self._Z = self.expand().impedance
+        # Form the impedance of the expanded network directly rather
+        # than building and combining the network.
+        ssym = s.expr
+        Yp = 1 / self.Rp.expr + 1 / (self.Lp.expr * ssym) + self.Cp.expr * ssym
+        self._Z = Impedance(self.Rs.expr + 1 / Yp)
         self.args = (Rs, Rp, Cp, Lp)
 
     def expand(self):
 
-        return R(self.Rs) + (R(self.Rp) + L(self.Lp) + C(self.Cp))
+        return R(self.Rs) + (R(self.Rp) | L(self.Lp) | C(self.Cp))
 
     def net_make(self, net, n1=None, n2=None):
 
         # TODO: draw this with a symbol
-        net = self.expand()
-        return net.net_make(net, n1, n2)            
+        return self.expand().net_make(net, n1, n2)
     
 class LoadCircuit(Network):
     """Circuit comprised of a load oneport connected in parallel with a
@@ -1276,8 +1283,74 @@ class P(O):
     pass
 
     
+def _combine_series_L(arg1, arg2):
+
+    # The currents should be the same!
+    if not _is_equal(arg1.i0, arg2.i0) or arg1.hasic != arg2.hasic:
+        raise ValueError('Series inductors with different'
+                         ' initial currents!')
+    i0 = arg1.i0 if arg1.hasic else None
+    return L(arg1.L + arg2.L, i0)
+
+
+def _combine_series_C(arg1, arg2):
+
+    v0 = arg1.v0 + arg2.v0 if arg1.hasic or arg2.hasic else None
+    return C(arg1.C * arg2.C / (arg1.C + arg2.C), v0)
+
+
+def _combine_parallel_C(arg1, arg2):
+
+    # The voltages should be the same!
+    if not _is_equal(arg1.v0, arg2.v0) or arg1.hasic != arg2.hasic:
+        raise ValueError('Parallel capacitors with different'
+                         ' initial voltages!')
+    v0 = arg1.v0 if arg1.hasic else None
+    return C(arg1.C + arg2.C, v0)
+
+
+def _combine_parallel_L(arg1, arg2):
+
+    i0 = arg1.i0 + arg2.i0 if arg1.hasic or arg2.hasic else None
+    return L(arg1.L * arg2.L / (arg1.L + arg2.L), i0)
+
+
+def _combine_same(combiners, arg1, arg2):
+    """Combine two components of the same class using the function in
+    combiners for their class, allowing for subclasses.  None is
+    returned if they cannot be combined, say current sources in
+    series."""
+
+    for cls in arg1.__class__.__mro__:
+        combiner = combiners.get(cls)
+        if combiner is not None:
+            return combiner(arg1, arg2)
+    return None
+
+
+# Functions to combine two components of the same class, keyed by the
+# component class.  Could simplify Vac and Iac if same frequency.
+_series_combiners = {
+    Vdc: lambda arg1, arg2: Vdc(arg1.v0 + arg2.v0),
+    V: lambda arg1, arg2: V(arg1 + arg2),
+    R: lambda arg1, arg2: R(arg1._R + arg2._R),
+    L: _combine_series_L,
+    G: lambda arg1, arg2: G(arg1._G * arg2._G / (arg1._G + arg2._G)),
+    C: _combine_series_C,
+}
+
+_parallel_combiners = {
+    Idc: lambda arg1, arg2: Idc(arg1.i0 + arg2.i0),
+    I: lambda arg1, arg2: I(arg1 + arg2),
+    G: lambda arg1, arg2: G(arg1._G + arg2._G),
+    C: _combine_parallel_C,
+    R: lambda arg1, arg2: R(arg1._R * arg2._R / (arg1._R + arg2._R)),
+    L: _combine_parallel_L,
+}
+
+    
 # Imports at end to circumvent circular dependencies
-from .expr import Expr
+from .expr import Expr, _is_zero
 from .cexpr import cExpr, Iconst, Vconst
 from .sexpr import sExpr, Is, Vs, Ys, Zs
 from .texpr import tExpr
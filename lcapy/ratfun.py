@@ -285,6 +285,22 @@ class Ratfun(object):
     def __init__(self, expr, var):
         self.expr = expr
         self.var = var
+        # The following are computed on demand and cached since
+        # the expression is not modified.
+        self._numer_denom = None
+        self._roots = None
+        self._poles = {}
+        self._residue_parts = None
+
+    @classmethod
+    def from_numer_denom(cls, N, D, var):
+        """Create rational function N / D where N and D are polynomials
+        in var.  This avoids splitting the expression into numerator
+        and denominator again."""
+
+        obj = cls(N / D, var)
+        obj._numer_denom = N, D
+        return obj
 
     def as_ratfun_delay(self):
         """Split expr as (N, D, delay)
@@ -333,7 +349,9 @@ class Ratfun(object):
         """Return roots of expression as a dictionary
         Note this may not find them all."""
 
-        return sym.roots(sym.Poly(self.expr, self.var))
+        if self._roots is None:
+            self._roots = sym.roots(sym.Poly(self.expr, self.var))
+        return self._roots.copy()
 
     def zeros(self):
         """Return zeroes of expression as a dictionary
@@ -345,6 +363,9 @@ class Ratfun(object):
         """Return poles of expression as a dictionary of Pole objects.
         Note this may not find all the poles."""
 
+        if damping in self._poles:
+            return list(self._poles[damping])
+
         poles = []
         for p, n in Ratfun(self.denominator, self.var).roots().items():
 
@@ -356,12 +377,12 @@ class Ratfun(object):
                     break
             if pole.n != 0:
                 poles.append(pole)
-        
-        return poles
+
+        self._poles[damping] = poles
+        return list(poles)
 
     def residue(self, pole, poles):
 
-        expr = self.expr
         var = self.var
 
         # Remove occurrence of pole; sym.cancel
@@ -369,14 +390,27 @@ class Ratfun(object):
         occurrences = []
         for p in poles:
             occurrences += [p.n - 1 if p.expr == pole else p.n]
-        
-        numer, denom = expr.as_numer_denom()
-        Dpoly = sym.Poly(denom, var)
-        K = Dpoly.LC()
+
+        # The numerator and leading coefficient of the denominator
+        # are the same for each pole so they are only found once.
+        if self._residue_parts is None:
+            numer, denom = self.numerator_denominator
+            K = sym.Poly(denom, var).LC()
+            self._residue_parts = numer, K
+        numer, K = self._residue_parts
         
         D = [(var - p.expr) ** o for p, o in zip(poles, occurrences)]
         denom = sym.Mul(K, *D)
-        
+
+        # For a simple pole the reduced denominator is a product of
+        # factors that are non-zero at the pole so the residue can be
+        # found by substitution rather than with a limit.
+        d = sym.expand(denom.subs(var, pole))
+        if d != 0 and d.is_finite:
+            n = sym.expand(numer.subs(var, pole))
+            if n.is_finite:
+                return n / d
+
         d = sym.limit(denom, var, pole)
         
         if d != 0:
@@ -392,8 +426,10 @@ class Ratfun(object):
     @property
     def numerator_denominator(self):
         """Return numerator and denominator of rational function"""
-        
-        return as_numer_denom(self.expr, self.var)
+
+        if self._numer_denom is None:
+            self._numer_denom = as_numer_denom(self.expr, self.var)
+        return self._numer_denom
 
     @property
     def N(self):
@@ -669,7 +705,7 @@ class Ratfun(object):
         expr = M / D
         var = self.var
         
-        sexpr = Ratfun(expr, var)
+        sexpr = Ratfun.from_numer_denom(M, D, var)
         poles = sexpr.poles(damping=damping)
 
         if damping == 'critical':
@@ -26,7 +26,7 @@ class sExpr(Expr):
         super(sExpr, self).__init__(val, **assumptions)
         self._laplace_conjugate_class = tExpr
 
-        if self.expr.find(tsym) != set():
+        if self.expr.has(tsym):
             raise ValueError(
                 's-domain expression %s cannot depend on t' % self.expr)
 
@@ -208,9 +208,9 @@ class sExpr(Expr):
 
         return N, D, delay
 
-    def evaluate(self, svector=None):
+    def evaluate(self, svector=None, backend=None):
 
-        return super(sExpr, self).evaluate(svector)
+        return super(sExpr, self).evaluate(svector, backend=backend)
 
     def plot(self, t=None, **kwargs):
         """Plot pole-zero map."""
@@ -276,7 +276,11 @@ def symdebug(expr, s='', indent=0):
 def symbol_map(name):
 
     new = name
-    if not isinstance(name, str):
+    if type(name) is Symbol:
+        # Avoid the printer for the common case of a symbol.  Note,
+        # subclasses such as Dummy are printed differently.
+        name = name.name
+    elif not isinstance(name, str):
         name = str(name)
     
     # Replace symbol names with symbol definitions to
@@ -1,5 +1,7 @@
 from lcapy import *
 from lcapy.cexpr import cExpr
+import numpy as np
+import sympy as sym
 import unittest
 
 
@@ -47,6 +49,13 @@ class LcapyTester(unittest.TestCase):
         self.assertEqual2(a.phase, Expr(pi / 2), "phase incorrect.")
         self.assertEqual2(a.phase_degrees, Expr(90), "phase incorrect.")
         self.assertEqual2(a.sign, Expr(j), "sign incorrect.")
+        a.real.magnitude
+        self.assertEqual(a.real.part, 'real', "real part modified by magnitude.")
+        a.imag.part = 'phase'
+        self.assertEqual(a.imag.part, 'imaginary', "cached imag part modified.")
+        a.phase.units = 'degrees'
+        self.assertEqual(a.phase.units, 'rad', "cached phase modified.")
+        self.assertIsNot(a.polar, a.polar, "cached polar shared.")
         self.assertEqual2(-a.sign, Expr(-j), "sign incorrect.")        
 
 
@@ -207,6 +216,17 @@ class LcapyTester(unittest.TestCase):
             a.ZPK(), 1 / ((s + 4)**2), "ZPK incorrect.")
         self.assertEqual(a.inverse_laplace(causal=True), t * exp(-4 * t) * Heaviside(t), "inverse Laplace incorrect.")        
 
+        a = 1 / (s + 4)**3
+        self.assertEqual(a.inverse_laplace(causal=True), t**2 * exp(-4 * t) * Heaviside(t) / 2, "inverse Laplace incorrect for triple pole.")
+
+        a = 1 / (s**2 + 1)**2
+        b = (sin(t) - t * cos(t)) * Heaviside(t) / 2
+        d = (a.inverse_laplace(causal=True) - b).expr.rewrite(sym.cos)
+        self.assertEqual(sym.simplify(d), 0, "inverse Laplace incorrect for repeated complex poles.")
+
+        a = 1 / ((s**2 + 1) * (s**2 + 4))
+        self.assertEqual(a.inverse_laplace(causal=True), (sin(t) / 3 - sin(2 * t) / 6) * Heaviside(t), "inverse Laplace incorrect for quadratic factors.")
+
 
     def test_sExpr7(self):
         """Lcapy: check sExpr7 (delay)
@@ -267,6 +287,18 @@ class LcapyTester(unittest.TestCase):
         self.assertEqual(a.evaluate(2), 0, "scalar evaluate incorrect.")
         self.assertEqual(a.laplace(), 1, "Laplace transform incorrect.")
 
+    def test_laplace_simplify(self):
+        """Lcapy: check Laplace transform simplification
+
+        """
+        from lcapy.laplace import laplace_transform
+
+        a = ((t + 1) * exp(-t)).expr
+        b = ((s + 2) / (s**2 + 2 * s + 1)).expr
+
+        self.assertEqual(laplace_transform(a, t.expr, s.expr, simplify=True), b, "Simplified Laplace transform incorrect.")
+        self.assertEqual(sExpr(laplace_transform(a, t.expr, s.expr)), sExpr(b), "Laplace transform incorrect.")
+
     def test_jomega(self):
         """Lcapy: check jomega
 
@@ -301,6 +333,11 @@ class LcapyTester(unittest.TestCase):
         a3 = s.subs({s: omega})
         self.assertEqual(a1, a3, "Substitution fail with dict.")
 
+        H = Hs('a * s + b')
+        a4 = H.subs({'a': 'b', 'b': 4})
+        self.assertEqual(a4, Hs(4 * s + 4), "Sequential substitution fail with dict.")
+        self.assertEqual(type(a4), Hs, "Substitution class fail with dict.")
+
 
     def test_types(self):
         """Lcapy: check types
@@ -346,6 +383,83 @@ class LcapyTester(unittest.TestCase):
         self.assertEqual(a.evaluate(0j), 0j, "Evaluate fail for sqrt(0j)")
         self.assertEqual(a.evaluate(2j), 1 + 1j, "Evaluate fail for sqrt(1+1j)")
         self.assertEqual(a.evaluate(4), 2, "Evaluate fail for sqrt(4)")
+        a = exp(-t) * u(t)
+        tv = (-1, 0, 1)
+        self.assertEqual(list(a.evaluate(tv)), [a.evaluate(t1) for t1 in tv],
+                         "Evaluate fail for vector with Heaviside")
+        a = exp(-t) * cos(3 * t)
+        tv = (0, 0.5, 1)
+        self.assertTrue(np.allclose(a.evaluate(tv, backend='numba'),
+                                    a.evaluate(tv)),
+                        "Evaluate fail for numba backend")
+        self.assertTrue(np.allclose(a.evaluate(tv, backend='numexpr'),
+                                    a.evaluate(tv)),
+                        "Evaluate fail for numexpr backend")
+        a = (1 / (s + 1)).inverse_laplace(causal=True)
+        tv = (-1, 0, 1)
+        self.assertTrue(np.allclose(a.evaluate(tv, backend='numba'),
+                                    a.evaluate(tv)),
+                        "Evaluate fail for numba backend with Heaviside")
+        a = sqrt(t)
+        tv = (-1, 0, 1)
+        self.assertTrue(np.allclose(a.evaluate(tv, backend='numba'),
+                                    a.evaluate(tv)),
+                        "Evaluate fail for numba backend with sqrt")
+
+    def test_evalf(self):
+        """Lcapy: check evalf
+
+        """
+        a = cExpr('sqrt(2)')
+        self.assertEqual(a.evalf().__class__, cExpr, "evalf class incorrect")
+        self.assertAlmostEqual(float(a.evalf().expr), 1.4142135623731,
+                               msg="evalf incorrect")
+        self.assertEqual(a.val.expr, a.evalf().expr, "val incorrect")
+
+    def test_call_array(self):
+        """Lcapy: check call with numpy array
+
+        """
+        a = 1 / (s + 1)
+        self.assertTrue(np.allclose(a(np.array([0, 1])), [1, 0.5]),
+                        "call fail for array")
+        self.assertEqual(a([1])[0], sExpr(1) / 2, "call fail for list")
+
+        tv = np.array([-1, 0, 2])
+        b = log(t)
+        c = b(tv)
+        self.assertEqual(c[0], b([-1])[0], "call fail for log array")
+        self.assertEqual(c[0].expr, sym.I * sym.pi, "call fail for log(-1)")
+        self.assertEqual(c[2].expr, sym.log(2), "call fail for log(2)")
+        self.assertEqual(c[1].expr, sym.zoo, "call fail for log(0)")
+        h = Heaviside(t)(tv)
+        self.assertEqual(h[1].expr, sym.Heaviside(0),
+                         "call fail for Heaviside(0)")
+        d = DiracDelta(t)(tv)
+        self.assertEqual(d[1].expr, sym.DiracDelta(0),
+                         "call fail for DiracDelta(0)")
+        self.assertTrue(np.allclose(a(np.array([0, 1]), backend='numba'),
+                                    [1, 0.5]), "call fail for numba backend")
+
+    def test_ExprTuple(self):
+        """Lcapy: check ExprTuple
+
+        """
+        a = expr((s, 2))
+        self.assertEqual(a[0].__class__, sExpr, "ExprTuple element class")
+        self.assertEqual(a.subs(s, 3), expr((3, 2)), "ExprTuple subs")
+
+    def test_to_numpy(self):
+        """Lcapy: check container to_numpy
+
+        """
+        a = expr([1, 2, sqrt(2)]).to_numpy()
+        self.assertEqual(a.dtype, np.float64, "to_numpy real dtype")
+        self.assertTrue(np.allclose(a, [1, 2, np.sqrt(2)]), "to_numpy real")
+        a = expr((1, j)).to_numpy()
+        self.assertTrue(np.allclose(a, [1, 1j]), "to_numpy complex")
+        a = (1 / ((s + 1) * (s + 2))).poles().to_numpy()
+        self.assertTrue(np.allclose(a, [1, 1]), "to_numpy dict values")
 
     def test_zp2k(self):
 
@@ -480,6 +594,13 @@ class LcapyTester(unittest.TestCase):
 
         self.assertEqual(expr('4').limit(t, 0), 4, "limit")
         self.assertEqual(expr('t + 4').limit(t, 0), 4, "limit")        
+
+    def test_prune_HOT(self):
+
+        a = s**3 + 2 * s**2 + 3 * s + 4
+        self.assertEqual(a.prune_HOT(1), 3 * s + 4, "prune_HOT")
+        self.assertEqual(a.prune_HOT(3), a, "prune_HOT same degree")
+        self.assertEqual(a.prune_HOT(5), a, "prune_HOT higher degree")
         
     def test_parameterize(self):
 
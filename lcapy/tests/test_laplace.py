@@ -76,3 +76,18 @@ class LcapyTester(unittest.TestCase):
 
         self.assertEqual(H, H2, "second derivative of undef")                
         
+
+    def test_product_ratfun(self):
+
+        H = Vs('V(s) / ((s + 1) * (s + 2))')
+        h = H.inverse_laplace(causal=True)
+
+        self.assertEqual(len(h.expr.atoms(sym.Integral)), 1, "single convolution")
+
+    def test_delay_in_sum(self):
+
+        H = sExpr('(s + exp(-s)) / (s * (s + 1))')
+        h = H.inverse_laplace(causal=True)
+        h2 = (1 - exp(1 - t)) * Heaviside(t - 1) + exp(-t) * Heaviside(t)
+
+        self.assertEqual(h, h2, "delay in sum")
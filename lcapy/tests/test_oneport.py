@@ -250,6 +250,17 @@ class LcapyTester(unittest.TestCase):
         self.assertEqual2(a.isc, 10 * cos(omega * t), "AC incorrect.")
 
 
+    def test_FerriteBead(self):
+        """Lcapy: check FerriteBead
+
+        """
+        a = FerriteBead(1, 2, 3, 4)
+
+        self.assertEqual2(a.Zs.simplify(), (1 + 1 / (sExpr(1) / 2 + 1 / (4 * s) + 3 * s)).simplify(), "Zs incorrect.")
+
+        lines = Xtal(1, 2, 3, 4).netlist().split('\n')
+        self.assertEqual(len(set(lines)), len(lines), "Xtal netlist nodes reused.")
+
     def test_CPE(self):
         """Lcapy: check CPE
 
@@ -25,7 +25,7 @@ class tExpr(Expr):
         self._fourier_conjugate_class = fExpr
         self._laplace_conjugate_class = sExpr
 
-        if self.expr.find(ssym) != set():
+        if self.expr.has(ssym):
             raise ValueError(
                 't-domain expression %s cannot depend on s' % self.expr)
 